@@ -0,0 +1,80 @@
+'''
+Micro-benchmark per-call overhead of operation codes: computing the code
+(i.e., hashing the operation name) on every request, versus looking up the
+precomputed code (see :mod:`cpp_delegate.op_codes`).
+
+Requests are sent to an emulated device over a loopback link (see
+:class:`cpp_delegate.emulator.DeviceEmulator`), so timings measure host-side
+overhead only::
+
+    python benchmarks/op_codes.py -o op_codes.json
+'''
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from cpp_delegate.context import MEM_READ_REQUEST, RemoteContext
+from cpp_delegate.emulator import DeviceEmulator
+from cpp_delegate.op_codes import OP_CODES, OP_MEM_READ, operation_code
+from remote_context import measure, synthetic_ast
+
+
+def benchmark(min_time=.2):
+    '''
+    Returns
+    -------
+    dict
+        Mean duration of each call, in seconds.
+    '''
+    cpp_ast_json = synthetic_ast(10)
+    device = DeviceEmulator(cpp_ast_json)
+    ctx = RemoteContext(device, cpp_ast_json)
+    address = device.base_address
+
+    def mem_read_hashed():
+        # Request as sent before operation codes were precomputed.
+        MEM_READ_REQUEST.pack_into(ctx._writer.payload, 0,
+                                   operation_code('mem_read'), address, 4)
+        return np.fromstring(ctx._request(MEM_READ_REQUEST.size),
+                             dtype='uint8')
+
+    def mem_read_precomputed():
+        MEM_READ_REQUEST.pack_into(ctx._writer.payload, 0, OP_MEM_READ,
+                                   address, 4)
+        return np.fromstring(ctx._request(MEM_READ_REQUEST.size),
+                             dtype='uint8')
+
+    return {'op_code.hashed_s': measure(lambda: operation_code('mem_read'),
+                                        min_time),
+            'op_code.precomputed_s': measure(lambda: OP_CODES['mem_read'],
+                                             min_time),
+            'mem_read.hashed_s': measure(mem_read_hashed, min_time),
+            'mem_read.precomputed_s': measure(mem_read_precomputed,
+                                              min_time)}
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip()
+                                     .splitlines()[0])
+    parser.add_argument('-o', '--output', help='Write results to JSON file.')
+    parser.add_argument('--min-time', type=float, default=.2,
+                        help='Minimum duration of each timing run, in '
+                        'seconds.')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    results = benchmark(args.min_time)
+    for key_i in sorted(results):
+        print >> sys.stderr, '{:<25} {:>8.2f} us'.format(key_i,
+                                                         results[key_i] * 1e6)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+'''
+Benchmark hot paths of :class:`cpp_delegate.context.RemoteContext` against
+an emulated device (see :class:`cpp_delegate.emulator.DeviceEmulator`).
+
+Results are written as JSON, so runs (e.g., before and after a change) can
+be compared::
+
+    python benchmarks/remote_context.py -o before.json
+    # ... apply change ...
+    python benchmarks/remote_context.py -o after.json --compare before.json
+
+By default, the emulated link has no latency and unlimited bandwidth (i.e.,
+a loopback), so results measure host-side overhead only.
+'''
+import argparse
+import datetime as dt
+import json
+import platform
+import subprocess
+import sys
+import timeit
+
+import numpy as np
+
+from cpp_delegate.context import RemoteContext
+from cpp_delegate.emulator import DeviceEmulator
+
+#: Number of globals in each synthetic namespace.
+SIZES = (10, 100, 1000)
+# Types of synthetic globals (cycled).
+TYPES = ('uint8_t', 'int16_t', 'uint32_t', 'float', 'double', 'int32_t [8]')
+
+
+def synthetic_ast(size):
+    '''
+    Parameters
+    ----------
+    size : int
+        Number of global variables.
+
+    Returns
+    -------
+    dict
+        C++ abstract syntax tree with :data:`size` global variables of
+        mixed types and one function.
+    '''
+    members = {'add': {'kind': 'FUNCTION_DECL', 'name': 'add',
+                       'result_type': 'float',
+                       'arguments': [{'name': 'x', 'type': 'float',
+                                      'kind': 'FLOAT'},
+                                     {'name': 'y', 'type': 'float',
+                                      'kind': 'FLOAT'}]}}
+    for i in range(size):
+        name_i = 'global_{:04d}'.format(i)
+        type_i = TYPES[i % len(TYPES)]
+        members[name_i] = {'kind': ('CONSTANTARRAY' if '[' in type_i
+                                    else 'VAR_DECL'),
+                           'name': name_i, 'type': type_i,
+                           'underlying_type': type_i, 'const': False,
+                           'volatile': False,
+                           'location': {'file': 'main.cpp',
+                                        'start': {'line': i + 1,
+                                                  'column': 1}}}
+    return {'members': members}
+
+
+def measure(function, min_time=.2):
+    '''
+    Returns
+    -------
+    float
+        Best mean duration of a call to :data:`function`, in seconds.
+    '''
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        duration = timer.timeit(number)
+        if duration >= min_time:
+            break
+        number *= 2
+    return min(timer.repeat(3, number)) / number
+
+
+def benchmark(size, emulator_kwargs, min_time=.2):
+    '''
+    Returns
+    -------
+    dict
+        Benchmark results for a namespace of :data:`size` globals.
+    '''
+    cpp_ast_json = synthetic_ast(size)
+    device = DeviceEmulator(cpp_ast_json, functions={'add': lambda x, y:
+                                                     x + y},
+                            **emulator_kwargs)
+    names = sorted(device.addresses.keys())
+    scalar = names[0]
+    array = [name_i for name_i in names if '[' in
+             device._attributes[name_i]['type']][0]
+
+    results = {}
+    results['startup_s'] = measure(lambda: RemoteContext(device,
+                                                         cpp_ast_json),
+                                   min_time)
+    ctx = RemoteContext(device, cpp_ast_json)
+    results['prime_addresses_s'] = measure(ctx.prime_addresses, min_time)
+
+    def read_scalar():
+        getattr(ctx, scalar)
+
+    def write_scalar():
+        setattr(ctx, scalar, 1)
+
+    for key_i, function_i in (('getattr', read_scalar),
+                              ('setattr', write_scalar),
+                              ('getattr_array', lambda: getattr(ctx, array)),
+                              ('call', lambda: ctx.add(1, 2))):
+        latency_i = measure(function_i, min_time)
+        results[key_i] = {'latency_s': latency_i, 'ops_per_s': 1 / latency_i}
+
+    nbytes = 4096
+    address = device.base_address
+    device.memory = np.zeros(max(device.memory.size, nbytes), dtype='uint8')
+    latency = measure(lambda: ctx.read_memory(address, nbytes), min_time)
+    results['read_memory'] = {'nbytes': nbytes, 'latency_s': latency,
+                              'bytes_per_s': nbytes / latency}
+    latency = measure(lambda: ctx.write_memory(address,
+                                               device.memory[:nbytes]),
+                      min_time)
+    results['write_memory'] = {'nbytes': nbytes, 'latency_s': latency,
+                               'bytes_per_s': nbytes / latency}
+
+    snapshot_bytes = sum([dtype_i.itemsize for dtype_i in
+                          ctx._dtypes.values() if dtype_i is not None])
+    latency = measure(ctx._read_attributes, min_time)
+    results['snapshot'] = {'nbytes': snapshot_bytes, 'latency_s': latency,
+                           'bytes_per_s': snapshot_bytes / latency}
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=''):
+    '''
+    Returns
+    -------
+    dict
+        Timing values (keys ending in ``_s``), keyed by dotted path.
+    '''
+    output = {}
+    for key_i, value_i in results.items():
+        if isinstance(value_i, dict):
+            output.update(flatten(value_i, prefix + key_i + '.'))
+        elif key_i.endswith('_s'):
+            output[prefix + key_i] = value_i
+    return output
+
+
+def compare(results, baseline):
+    '''
+    Print ratio of each timing to baseline (``< 1`` is faster).
+    '''
+    current = flatten(results['results'])
+    previous = flatten(baseline['results'])
+    print '{:<45} {:>12} {:>12} {:>7}'.format('timing', 'baseline',
+                                              'current', 'ratio')
+    for key_i in sorted(set(current) & set(previous)):
+        print '{:<45} {:>12.3e} {:>12.3e} {:>7.2f}'.format(
+            key_i, previous[key_i], current[key_i],
+            current[key_i] / previous[key_i])
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip()
+                                     .splitlines()[0])
+    parser.add_argument('-o', '--output', help='Write results to JSON file.')
+    parser.add_argument('--compare', help='Compare results to JSON file '
+                        'written by a previous run.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='Number of globals in each synthetic namespace '
+                        '(default: %(default)s).')
+    parser.add_argument('--latency', type=float, default=0.,
+                        help='Emulated processing latency, in seconds.')
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='Emulated link bandwidth, in bytes per second '
+                        '(default: unlimited).')
+    parser.add_argument('--min-time', type=float, default=.2,
+                        help='Minimum duration of each timing run, in '
+                        'seconds.')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    emulator_kwargs = {'latency': args.latency, 'bandwidth': args.bandwidth}
+    output = {'timestamp': dt.datetime.utcnow().isoformat(),
+              'git_revision': git_revision(),
+              'python': sys.version.split()[0],
+              'platform': platform.platform(),
+              'emulator': emulator_kwargs,
+              'results': {}}
+    for size_i in args.sizes:
+        print >> sys.stderr, 'Benchmarking {} globals...'.format(size_i)
+        output['results'][str(size_i)] = benchmark(size_i, emulator_kwargs,
+                                                   args.min_time)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(output, output_file, indent=2, sort_keys=True)
+    else:
+        print json.dumps(output, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, 'r') as input_:
+            compare(output, json.load(input_))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,197 @@
 from collections import OrderedDict
+import copy
+import hashlib
 import json
+import multiprocessing as mp
 
 import clang_helpers.clang_ast as ca
 import path_helpers as ph
 
+from .ast_cache import AstCache
+from . import ast_file
 
-def dump_cpp_ast(env):
+
+#: File extensions of C++ translation units (see :func:`dump_cpp_ast`).
+SOURCE_EXTENSIONS = ('.cpp', '.cc', '.cxx')
+#: File extensions of C/C++ headers.
+HEADER_EXTENSIONS = ('.h', '.hh', '.hpp', '.hxx')
+
+
+def dump_cpp_ast(env, processes=None, formats=('json', 'binary')):
+    '''
+    Parse every C++ translation unit in ``PROJECTSRC_DIR`` and write the
+    merged abstract syntax tree to ``lib/<project>/cpp_ast.json`` and/or
+    ``lib/<project>/cpp_ast.bin``.
+
+    Abstract syntax trees of unchanged translation units are loaded from the
+    cache (see :class:`cpp_delegate.ast_cache.AstCache`); the remaining
+    translation units are parsed in parallel, in a pool of worker processes.
+
+    Unless ``FIRMWARE_ID`` is already defined in the build environment, it
+    is defined (``CPPDEFINES``) as a hash of the cache key of every
+    translation unit, i.e., of the contents of each source file and its
+    headers and of the build flags (see :func:`get_firmware_id`).
+
+    Parameters
+    ----------
+    env : SCons.Environment
+        Build environment.
+    processes : int, optional
+        Number of worker processes (default: number of CPUs).
+    formats : tuple, optional
+        Output formats:
+
+         - ``"json"``: indented JSON (``cpp_ast.json``);
+         - ``"binary"``: compact binary format, which may be loaded lazily
+           (``cpp_ast.bin``; see :func:`cpp_delegate.ast_file.load`).
+    '''
     project_dir = ph.path(env['PROJECT_DIR'])
     project_name = project_dir.name.replace('-', '__')
     lib_dir = project_dir.joinpath('lib', project_name)
     lib_dir.makedirs_p()
 
-    main_c_file = ph.path(env['PROJECTSRC_DIR']).joinpath('main.cpp')
-    cpp_ast_json = parse_cpp_ast(main_c_file, env)
+    src_dir = ph.path(env['PROJECTSRC_DIR'])
+    # Parse `main.cpp` first, so its declarations take precedence on merge.
+    sources = sorted([p for p in src_dir.walkfiles()
+                      if p.ext.lower() in SOURCE_EXTENSIONS],
+                     key=lambda p: (p != src_dir.joinpath('main.cpp'), p))
+    flags = get_clang_flags(env)
+
+    cache = AstCache(project_dir.joinpath('.cpp_ast_cache'))
+    keys = [cache.key(source_i, flags) for source_i in sources]
+
+    # Tie firmware ID to build inputs, unless defined explicitly.  Quoted, so
+    # the define expands to a string literal.
+    if not any(flag_i.split('=')[0].split(' ')[0] == '-DFIRMWARE_ID'
+               for flag_i in flags):
+        env.Append(CPPDEFINES=[('FIRMWARE_ID',
+                                '\\"{}\\"'.format(get_firmware_id(keys)))])
+
+    # Only parse translation units that are not cached.
+    cpp_asts = [cache.get(source_i, key_i)
+                for source_i, key_i in zip(sources, keys)]
+    misses = [i for i, cpp_ast_i in enumerate(cpp_asts) if cpp_ast_i is None]
+    print 'Using cached C++ AST for {}/{} translation units.'.format(
+        len(sources) - len(misses), len(sources))
+    jobs = [(sources[i], flags) for i in misses]
+
+    if len(jobs) > 1 and processes != 1:
+        pool = mp.Pool(processes=min(processes or mp.cpu_count(),
+                                     len(jobs)))
+        try:
+            parsed = pool.map(_parse_translation_unit, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        parsed = map(_parse_translation_unit, jobs)
+    for i, cpp_ast_i in zip(misses, parsed):
+        cache.set(sources[i], keys[i], cpp_ast_i)
+        cpp_asts[i] = cpp_ast_i
+    cpp_ast_json = merge_cpp_asts(cpp_asts)
+
+    if 'json' in formats:
+        with lib_dir.joinpath('cpp_ast.json').open('w') as output:
+            json.dump(cpp_ast_json, output, indent=2)
+    if 'binary' in formats:
+        ast_file.dump(cpp_ast_json, lib_dir.joinpath('cpp_ast.bin'))
+
+
+def get_firmware_id(keys):
+    '''
+    Parameters
+    ----------
+    keys : list
+        Abstract syntax tree cache key of each translation unit (see
+        :meth:`cpp_delegate.ast_cache.AstCache.key`).
+
+    Returns
+    -------
+    str
+        Firmware ID derived from the build inputs, i.e., changes whenever a
+        source file, an included header, or a build flag changes.
+    '''
+    return hashlib.sha256(''.join(keys).encode('utf8')).hexdigest()[:16]
+
+
+def _parse_translation_unit(job):
+    '''
+    Worker process entry point (see :func:`dump_cpp_ast`).
 
-    with lib_dir.joinpath('cpp_ast.json').open('w') as output:
-        json.dump(cpp_ast_json, output, indent=2)
+    The build environment cannot be pickled, so flags are resolved (and the
+    cache is checked) by the parent process.
+    '''
+    source, flags = job
+    return ca.parse_cpp_ast(source, *flags, format='json')
 
 
-def parse_cpp_ast(source, env):
+def _is_header_node(node):
+    location = node.get('location') if isinstance(node, dict) else None
+    file_ = location.get('file') if isinstance(location, dict) else None
+    return file_ is not None and ph.path(file_).ext.lower() in \
+        HEADER_EXTENSIONS
+
+
+def merge_cpp_asts(cpp_asts):
+    '''
+    Merge abstract syntax trees of several translation units.
+
+    Namespaces are merged recursively.  A member (or type, etc.) declared in
+    more than one translation unit (e.g., an ``extern`` variable declared in
+    a shared header) is kept once; if the nodes differ, a node located in a
+    source file (i.e., a definition) is preferred over a node located in a
+    header, otherwise the node from the first translation unit is kept.
+
+    Parameters
+    ----------
+    cpp_asts : list
+        JSON-serializable C++ abstract syntax trees.
+
+    Returns
+    -------
+    dict
+        Merged abstract syntax tree.
+    '''
+    merged = {}
+    for cpp_ast_i in cpp_asts:
+        _merge_tree(merged, cpp_ast_i)
+    return merged
+
+
+def _merge_tree(target, source):
+    for key_i, value_i in source.items():
+        if key_i not in target:
+            target[key_i] = copy.deepcopy(value_i)
+        elif not (isinstance(value_i, dict) and
+                  isinstance(target[key_i], dict)):
+            continue
+        elif key_i == 'namespaces':
+            for name_ij, namespace_ij in value_i.items():
+                _merge_tree(target[key_i].setdefault(name_ij, {}),
+                            namespace_ij)
+        else:
+            # Name-keyed collection (e.g., `members`, `typedefs`).
+            for name_ij, node_ij in value_i.items():
+                existing_ij = target[key_i].get(name_ij)
+                if existing_ij is None or (existing_ij != node_ij and
+                                           _is_header_node(existing_ij) and
+                                           not _is_header_node(node_ij)):
+                    target[key_i][name_ij] = copy.deepcopy(node_ij)
+
+
+def get_clang_flags(env):
+    '''
+    Parameters
+    ----------
+    env : SCons.Environment
+        Build environment, providing include paths (``CPPPATH``) and defines
+        (``CPPDEFINES``).
+
+    Returns
+    -------
+    list
+        Define (``-D``) flags, followed by include path (``-I``) flags.
+    '''
     # Get include paths from build environment.
     cpppath_dirs = [ph.path(env[i[1:]] if i.startswith('$') else i)
                     for i in env['CPPPATH']]
@@ -38,8 +211,63 @@ def parse_cpp_ast(source, env):
     for d in defines:
         print 3 * ' ', d
 
-    return ca.parse_cpp_ast(source, *(define_flags + cpppath_flags),
-                            format='json')
+    return define_flags + cpppath_flags
+
+
+def parse_cpp_ast(source, env, cache_dir=None):
+    '''
+    Parameters
+    ----------
+    source : str
+        Path to C++ source file.
+    env : SCons.Environment
+        Build environment (see :func:`get_clang_flags`).
+    cache_dir : str, optional
+        If specified, directory of abstract syntax tree cache (see
+        :func:`parse_cpp_ast_flags`).
+
+    Returns
+    -------
+    dict
+        A JSON-serializable C++ abstract syntax tree.
+    '''
+    return parse_cpp_ast_flags(source, get_clang_flags(env),
+                               cache_dir=cache_dir)
+
+
+def parse_cpp_ast_flags(source, flags, cache_dir=None):
+    '''
+    Parameters
+    ----------
+    source : str
+        Path to C++ source file.
+    flags : list
+        Flags passed to clang (e.g., ``['-DFOO', '-Ilib']``).
+    cache_dir : str, optional
+        If specified, directory of abstract syntax tree cache (see
+        :class:`cpp_delegate.ast_cache.AstCache`).
+
+        If the source file, the headers it includes, and the flags are
+        unchanged since a previous call, the cached abstract syntax tree is
+        returned without running clang.
+
+    Returns
+    -------
+    dict
+        A JSON-serializable C++ abstract syntax tree.
+    '''
+    if cache_dir is None:
+        return ca.parse_cpp_ast(source, *flags, format='json')
+
+    cache = AstCache(cache_dir)
+    key = cache.key(source, flags)
+    cpp_ast_json = cache.get(source, key)
+    if cpp_ast_json is not None:
+        print 'Using cached C++ AST: {}'.format(key)
+        return cpp_ast_json
+    cpp_ast_json = ca.parse_cpp_ast(source, *flags, format='json')
+    cache.set(source, key, cpp_ast_json)
+    return cpp_ast_json
 
 
 def test(v):
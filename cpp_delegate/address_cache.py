@@ -0,0 +1,97 @@
+import hashlib
+import json
+
+import path_helpers as ph
+
+__all__ = ['AddressCache']
+
+
+class AddressCache(object):
+    '''
+    Persistent, on-disk cache of remote attribute addresses.
+
+    Addresses are stored in ``address_cache.json`` next to the C++ abstract
+    syntax tree file written by :func:`cpp_delegate.dump_cpp_ast` (i.e.,
+    ``lib/<project>/cpp_ast.json``).
+
+    Entries are keyed by the firmware ID reported by the remote device and
+    the namespace.  The cache file also records a hash of the abstract syntax
+    tree file; if the hash changes (i.e., the firmware was rebuilt from
+    modified sources), all cached entries are evicted.
+
+    .. warning::
+        Cached addresses are only valid if the firmware ID changes with every
+        build that may move attributes.  :func:`cpp_delegate.dump_cpp_ast`
+        defines ``FIRMWARE_ID`` as a hash of the build inputs; if
+        ``FIRMWARE_ID`` is not defined, the firmware falls back to its build
+        date and time, which is *not* safe to use with this cache.
+
+    Parameters
+    ----------
+    cpp_ast_path : str
+        Path to C++ abstract syntax tree JSON file.
+    '''
+    def __init__(self, cpp_ast_path):
+        cpp_ast_path = ph.path(cpp_ast_path)
+        self.path = cpp_ast_path.parent.joinpath('address_cache.json')
+        self.ast_hash = hashlib.sha256(cpp_ast_path.bytes()).hexdigest()
+
+    def _load(self):
+        '''
+        Returns
+        -------
+        dict
+            Mapping from each firmware ID to the cached addresses of each
+            namespace.
+
+            Empty if cache file does not exist, cannot be parsed, or was
+            written for a different abstract syntax tree.
+        '''
+        try:
+            with self.path.open('r') as input_:
+                cache = json.load(input_)
+        except (IOError, ValueError):
+            return {}
+        if cache.get('ast_hash') != self.ast_hash:
+            return {}
+        return cache.get('firmwares', {})
+
+    def get(self, firmware_id, namespace=''):
+        '''
+        Parameters
+        ----------
+        firmware_id : str
+            Firmware ID reported by remote device.
+        namespace : str, optional
+            Namespace specifier (e.g., ``"foo::bar"``).
+
+        Returns
+        -------
+        dict or None
+            Mapping from attribute name to address, or ``None`` if no
+            addresses are cached for the specified firmware and namespace.
+        '''
+        return self._load().get(firmware_id, {}).get(namespace)
+
+    def set(self, firmware_id, namespace, addresses):
+        '''
+        Store addresses and write cache file.
+
+        Stale entries (i.e., entries written for a different abstract syntax
+        tree) are discarded.
+
+        Parameters
+        ----------
+        firmware_id : str
+            Firmware ID reported by remote device.
+        namespace : str
+            Namespace specifier (e.g., ``"foo::bar"``).
+        addresses : dict
+            Mapping from attribute name to address.
+        '''
+        firmwares = self._load()
+        firmwares.setdefault(firmware_id, {})[namespace] = \
+            dict([(k, int(v)) for k, v in addresses.items()])
+        with self.path.open('w') as output:
+            json.dump({'ast_hash': self.ast_hash, 'firmwares': firmwares},
+                      output, indent=2, sort_keys=True)
@@ -1,6 +1,10 @@
+import hashlib
+import re
+
 from pydash import py_ as py__
 import clang_helpers as ch
 import jinja2
+import numpy as np
 import path_helpers as ph
 import pydash as py_
 
@@ -59,7 +63,33 @@ py_.pick_by = lambda obj, predicate=None:\
           if predicate is None or predicate(v, k)])
 
 
-__all__ = ['get_attributes', 'render']
+__all__ = ['get_attributes', 'get_member_ids', 'member_id', 'name_hash',
+           'parse_array_type', 'render']
+
+
+# Spelling of constant-sized array type, e.g., `uint16_t [4][8]`.
+ARRAY_TYPE_PATTERN = re.compile(r'^(?P<element>.*?)\s*(?P<shape>(\[\d+\])+)$')
+
+
+def parse_array_type(type_):
+    '''
+    Parameters
+    ----------
+    type_ : str
+        C++ type spelling (e.g., ``"uint16_t [4][8]"``).
+
+    Returns
+    -------
+    tuple or None
+        Element type and shape of constant-sized array type (e.g.,
+        ``("uint16_t", (4, 8))``), or ``None`` if type is not a
+        constant-sized array.
+    '''
+    match = ARRAY_TYPE_PATTERN.match(type_)
+    if match is None:
+        return None
+    return (match.group('element'),
+            tuple(map(int, re.findall(r'\d+', match.group('shape')))))
 
 
 template = '''
@@ -67,16 +97,81 @@ template = '''
 #define ___ADDRESS_OF__H__
 
 #include <string.h>
+#include <CArrayDefs.h>
 #include "Arduino.h"
 #include "avr_emulation.h"
 {% for header_i in namespace_headers -%}
 #include "{{ header_i.name }}"
 {% endfor -%}
 
+#ifndef FIRMWARE_ID
+// Identifies firmware build (e.g., to key cached attribute addresses).
+//
+// WARNING: `cpp_delegate.dump_cpp_ast()` defines `FIRMWARE_ID` as a hash of
+// the build inputs.  The fallback below is *not* tied to the build (e.g.,
+// it does not change when another translation unit is rebuilt), so remote
+// contexts must not use an `address_cache` with it; override `FIRMWARE_ID`
+// (e.g., `-DFIRMWARE_ID=\\"<hash>\\"`) instead.
+#define FIRMWARE_ID __DATE__ " " __TIME__
+#endif
+
 {% for name_i, attr_i in attributes.iteritems() %}
-extern {{ 'volatile ' if attr_i.volatile else '' }}{{ 'const ' if attr_i.const else '' }}{{ attr_i.type }} {{ name_i }};
+extern {{ 'volatile ' if attr_i.volatile else '' }}{{ 'const ' if attr_i.const else '' }}{{ declarators[name_i] }};
 {%- endfor %}
 
+// Map each attribute to a unique numeric member ID, and to a hash of its
+// name (to detect host/firmware mismatch).
+{%- for id_i, name_i in address_table %}
+const uint16_t MEMBER_ID__{{ name_i }} = {{ '0x%04x'|format(id_i) }};
+const uint16_t NAME_HASH__{{ name_i }} = {{ '0x%04x'|format(name_hashes[name_i]) }};
+{%- endfor %}
+
+struct AddressEntry {
+    uint16_t member_id;
+    uint16_t name_hash;
+    void const *address;
+};
+
+// Address of each attribute, sorted by member ID.
+const uint16_t ADDRESS_TABLE_SIZE = {{ address_table|length }};
+const AddressEntry ADDRESS_TABLE[] = {
+{%- for id_i, name_i in address_table %}
+    {{ '{' }}MEMBER_ID__{{ name_i }}, NAME_HASH__{{ name_i }}, (void const *)&{{ name_i }}{{ '}' }}{{ ',' if not loop.last else '' }}
+{%- endfor %}
+};
+{% if mode == 'table' %}
+inline AddressEntry const *address_entry(uint16_t member_id) {
+    // Binary search of address table.
+    uint16_t lower = 0;
+    uint16_t upper = ADDRESS_TABLE_SIZE;
+    while (lower < upper) {
+        const uint16_t middle = lower + (upper - lower) / 2;
+        if (ADDRESS_TABLE[middle].member_id < member_id) {
+            lower = middle + 1;
+        } else {
+            upper = middle;
+        }
+    }
+    if (lower < ADDRESS_TABLE_SIZE &&
+        ADDRESS_TABLE[lower].member_id == member_id) {
+        return &ADDRESS_TABLE[lower];
+    }
+    return NULL;
+}
+
+inline uint32_t address_of(uint16_t member_id) {
+    AddressEntry const *entry = address_entry(member_id);
+    return entry ? reinterpret_cast<uint32_t>(entry->address) : 0;
+}
+
+inline uint32_t address_of(uint16_t member_id, uint16_t name_hash) {
+    // Address is zero if name hash does not match (i.e., the host and the
+    // firmware were generated from different abstract syntax trees).
+    AddressEntry const *entry = address_entry(member_id);
+    return (entry && entry->name_hash == name_hash)
+        ? reinterpret_cast<uint32_t>(entry->address) : 0;
+}
+{% else %}
 inline uint32_t address_of(char const *member_name) {
     {%- for name_i, attr_i in attributes.iteritems() -%}
     {{ ' else ' if loop.index0 else '\n    ' }}if (strcmp(member_name, "{{ name_i }}") == 0) {
@@ -86,6 +181,88 @@ inline uint32_t address_of(char const *member_name) {
     return 0;
 }
 
+inline uint32_t address_of(uint16_t member_id) {
+    switch (member_id) {
+    {%- for id_i, name_i in address_table %}
+        case MEMBER_ID__{{ name_i }}:
+            return reinterpret_cast<uint32_t>(&{{ name_i }});
+    {%- endfor %}
+        default:
+            return 0;
+    }
+}
+
+inline uint32_t address_of(uint16_t member_id, uint16_t name_hash) {
+    // Address is zero if name hash does not match (i.e., the host and the
+    // firmware were generated from different abstract syntax trees).
+    switch (member_id) {
+    {%- for id_i, name_i in address_table %}
+        case MEMBER_ID__{{ name_i }}:
+            return (name_hash == NAME_HASH__{{ name_i }})
+                ? reinterpret_cast<uint32_t>(&{{ name_i }}) : 0;
+    {%- endfor %}
+        default:
+            return 0;
+    }
+}
+{% endif %}
+inline UInt8Array address_table(UInt8Array request_arr, UInt8Array buffer) {
+    /*
+     * Write a page of ``ADDRESS_TABLE`` to ``buffer``, i.e., a ``uint16_t``
+     * member ID, a ``uint16_t`` name hash and a ``uint32_t`` address for
+     * each attribute.
+     *
+     * Parameters
+     * ----------
+     * request_arr : UInt8Array
+     *     Request message in the form:
+     *
+     *         [op_code: uint16][offset: uint16][count: uint16]
+     * buffer : UInt8Array
+     *     Buffer to write table entries to.
+     *
+     * Returns
+     * -------
+     * UInt8Array
+     *     Entries ``offset`` to ``offset + count`` of the table (clipped to
+     *     the table size).  If the request is malformed, ``offset`` is past
+     *     the end of the table, or the entries do not fit in ``buffer``, the
+     *     returned array has a length of zero.
+     */
+    UInt8Array output = buffer;
+    output.length = 0;
+
+    if (request_arr.length < 6) { return output; }
+    uint16_t offset = *reinterpret_cast<uint16_t *>(&request_arr.data[2]);
+    uint16_t count = *reinterpret_cast<uint16_t *>(&request_arr.data[4]);
+    if (offset >= ADDRESS_TABLE_SIZE) { return output; }
+    if (count > ADDRESS_TABLE_SIZE - offset) {
+        count = ADDRESS_TABLE_SIZE - offset;
+    }
+
+    const uint32_t size = count * sizeof(AddressEntry);
+    if (buffer.length >= size) {
+        memcpy(output.data, &ADDRESS_TABLE[offset], size);
+        output.length = size;
+    }
+    return output;
+}
+
+inline UInt8Array firmware_id(UInt8Array buffer) {
+    /*
+     * Write ``FIRMWARE_ID`` string (without trailing null character) to
+     * ``buffer``.
+     */
+    const char id[] = FIRMWARE_ID;
+    UInt8Array output = buffer;
+    output.length = 0;
+    if (buffer.length >= sizeof(id) - 1) {
+        memcpy(output.data, id, sizeof(id) - 1);
+        output.length = sizeof(id) - 1;
+    }
+    return output;
+}
+
 #endif  // #ifndef ___ADDRESS_OF__H__
 '''
 
@@ -100,15 +277,154 @@ def get_attributes(members):
                                               'Teensy3Clock', 'PIND', 'PINC',
                                               'SPCR', 'EIMSK'))
                        and '()' not in v['underlying_type']
-                       and 'ARRAY' not in v['kind']
+                       and ('ARRAY' not in v['kind']
+                            or v['kind'] == 'CONSTANTARRAY')
                        and not k.startswith('__'))
 
 
-def render(cpp_ast_json, attributes):
-    namespace_types = [v['type'] for k, v in attributes.iteritems()
-                       if '::' in v['type']]
+def member_id(name):
+    '''
+    Parameters
+    ----------
+    name : str
+        Attribute name.
+
+    Returns
+    -------
+    int
+        ``uint16`` member ID derived from SHA-1 hash of name.
+    '''
+    return np.fromstring(hashlib.sha1(name.encode('utf8')).digest()[:2],
+                         dtype='uint16')[0]
+
+
+def name_hash(name):
+    '''
+    Parameters
+    ----------
+    name : str
+        Attribute name.
+
+    Returns
+    -------
+    int
+        ``uint16`` hash of name, stored next to the member ID of each
+        attribute in the firmware address table, so the host can detect
+        firmware built from a different abstract syntax tree (i.e., where
+        the same member ID is assigned to a different attribute).
+
+        Derived from different bytes of the SHA-1 hash of name than
+        :func:`member_id`.
+    '''
+    return np.fromstring(hashlib.sha1(name.encode('utf8')).digest()[2:4],
+                         dtype='uint16')[0]
+
+
+def get_member_ids(attributes):
+    '''
+    Parameters
+    ----------
+    attributes : dict
+        Attribute nodes, keyed by attribute name.
+
+    Returns
+    -------
+    dict
+        Mapping from each attribute name to a unique ``uint16`` member ID.
+
+    Notes
+    -----
+    Names are assigned IDs in sorted order.  Each name is assigned its hashed
+    ID (see :func:`member_id`) or, if that ID is already taken, the next free
+    ID (wrapping around at ``0xFFFF``).  The generated firmware header (see
+    :func:`render`) and the host (see :class:`cpp_delegate.context.Context`)
+    both call this function, so both assign the same IDs.
+
+    Since IDs depend on the whole set of attributes, the firmware also
+    stores the hash of each name (see :func:`name_hash`) next to its ID, so
+    the host can detect firmware generated from a different set of
+    attributes.
+
+    Raises
+    ------
+    ValueError
+        If there are more attributes than ``uint16`` member IDs.
+    '''
+    if len(attributes) > 0x10000:
+        raise ValueError('Too many attributes for uint16 member IDs: {}'
+                         .format(len(attributes)))
+    names_by_id = {}
+    for name_i in sorted(attributes.keys()):
+        id_i = int(member_id(name_i))
+        while id_i in names_by_id:
+            # Probe for next free ID.
+            id_i = (id_i + 1) & 0xFFFF
+        names_by_id[id_i] = name_i
+    return dict([(v, k) for k, v in names_by_id.items()])
+
+
+def render(cpp_ast_json, attributes, mode='strcmp'):
+    '''
+    Parameters
+    ----------
+    cpp_ast_json : dict
+        JSON-serializable C++ abstract syntax tree.
+    attributes : dict
+        Attribute nodes, keyed by attribute name (see
+        :func:`get_attributes`).
+    mode : str, optional
+        Implementation of generated ``address_of()`` functions:
+
+         - ``"strcmp"``: look up address by name, comparing against each
+           attribute name, or by member ID using a ``switch``.
+         - ``"table"``: look up address by member ID using a binary search of
+           the constant address table, sorted by member ID (i.e., ``O(log
+           N)`` lookup).
+
+        In both modes, the constant address table is generated and may be
+        read in pages of several entries using ``address_table()``.
+
+    Returns
+    -------
+    str
+        C++ header defining ``address_of()``, ``address_table()``, and
+        ``firmware_id()`` functions.
+
+    Raises
+    ------
+    ValueError
+        If there are more attributes than ``uint16`` member IDs (see
+        :func:`get_member_ids`).
+    '''
+    if mode not in ('strcmp', 'table'):
+        raise ValueError('Unsupported mode: {}'.format(mode))
+    # Declarator of each attribute, e.g., `uint16_t samples[128]` for array
+    # type `uint16_t [128]`.
+    declarators = {}
+    element_types = {}
+    for name_i, attr_i in attributes.iteritems():
+        array_type_i = parse_array_type(attr_i['type'])
+        if array_type_i is None:
+            element_types[name_i] = attr_i['type']
+            declarators[name_i] = '{} {}'.format(attr_i['type'], name_i)
+        else:
+            element_types[name_i] = array_type_i[0]
+            declarators[name_i] = '{} {}{}'.format(array_type_i[0], name_i,
+                                                   ''.join(['[{}]'.format(d)
+                                                            for d in
+                                                            array_type_i[1]]))
+    namespace_types = [v for v in element_types.values() if '::' in v]
     namespace_headers = map(lambda v: get_definition_header(cpp_ast_json, v),
                             namespace_types)
     return jinja2.Template(template).render(attributes=attributes,
+                                            declarators=declarators,
+                                            address_table=
+                                            sorted([(v, k) for k, v in
+                                                    get_member_ids(attributes)
+                                                    .items()]),
+                                            name_hashes=
+                                            dict([(k, name_hash(k))
+                                                  for k in attributes]),
+                                            mode=mode,
                                             namespace_headers=
                                             namespace_headers)
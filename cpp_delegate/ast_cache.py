@@ -0,0 +1,193 @@
+import hashlib
+import json
+import re
+
+import path_helpers as ph
+import pkg_resources
+
+__all__ = ['AstCache', 'find_headers', 'get_parser_version']
+
+
+#: Version of cache key layout; bump to invalidate existing cache entries.
+CACHE_VERSION = 1
+
+# Matches `#include "foo.h"` and `#include <foo.h>` directives.
+INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s*([<"])([^>"]+)[>"]',
+                             re.MULTILINE)
+
+
+def get_parser_version():
+    '''
+    Returns
+    -------
+    str
+        Installed version of each package used to parse C++ source (e.g.,
+        ``"clang-helpers=0.7.1 clang=None libclang=None"``).
+    '''
+    versions = []
+    for name_i in ('clang-helpers', 'clang', 'libclang'):
+        try:
+            version_i = pkg_resources.get_distribution(name_i).version
+        except pkg_resources.DistributionNotFound:
+            version_i = None
+        versions.append('{}={}'.format(name_i, version_i))
+    return ' '.join(versions)
+
+
+def find_headers(source, include_dirs):
+    '''
+    Find headers transitively included by a source file.
+
+    Include directives are found by scanning each file for ``#include``
+    lines, *without* evaluating the preprocessor; headers included within
+    conditional blocks (e.g., ``#ifdef``) are always included.  Headers that
+    cannot be found in the include directories (e.g., compiler system
+    headers) are ignored.
+
+    Parameters
+    ----------
+    source : str
+        Path to C++ source file.
+    include_dirs : list
+        Include directories, in search order (i.e., ``-I`` flags).
+
+    Returns
+    -------
+    list
+        Path of each header found, sorted.
+    '''
+    include_dirs = [ph.path(dir_i) for dir_i in include_dirs]
+    headers = set()
+    pending = [ph.path(source).realpath()]
+    while pending:
+        path_i = pending.pop()
+        try:
+            text_i = path_i.bytes().decode('utf8', 'replace')
+        except IOError:
+            continue
+        for delimiter_ij, name_ij in INCLUDE_PATTERN.findall(text_i):
+            # Quoted includes are searched relative to including file first.
+            dirs_ij = ([path_i.parent] if delimiter_ij == '"' else []) + \
+                include_dirs
+            for dir_ijk in dirs_ij:
+                header_ijk = dir_ijk.joinpath(name_ij)
+                if header_ijk.isfile():
+                    header_ijk = header_ijk.realpath()
+                    if header_ijk not in headers:
+                        headers.add(header_ijk)
+                        pending.append(header_ijk)
+                    break
+    return sorted(headers)
+
+
+class AstCache(object):
+    '''
+    Persistent, on-disk, content-addressed cache of parsed C++ abstract
+    syntax trees.
+
+    Each entry is keyed by a hash (see :meth:`key`) of:
+
+     - the contents of the source file;
+     - the path and contents of each header transitively included by the
+       source file (see :func:`find_headers`);
+     - the clang flags (i.e., ``-D`` and ``-I`` flags);
+     - the parser version (see :func:`get_parser_version`).
+
+    At most one entry is kept per source file; writing an entry replaces
+    any previous entry for the same source file.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory where cache entries are stored (created if necessary).
+    parser_version : str, optional
+        Parser version (default: :func:`get_parser_version`).
+    '''
+    def __init__(self, cache_dir, parser_version=None):
+        self.cache_dir = ph.path(cache_dir)
+        self.parser_version = (get_parser_version() if parser_version is None
+                               else parser_version)
+
+    def key(self, source, flags):
+        '''
+        Parameters
+        ----------
+        source : str
+            Path to C++ source file.
+        flags : list
+            Flags passed to clang (e.g., ``['-DFOO', '-Ilib']``).
+
+        Returns
+        -------
+        str
+            Cache key, unique to the source file, its transitive headers, the
+            specified flags, and the parser version.
+        '''
+        include_dirs = [flag_i[2:] for flag_i in flags
+                        if flag_i.startswith('-I')]
+        hash_ = hashlib.sha256()
+        hash_.update('{}\0{}\0'.format(CACHE_VERSION, self.parser_version)
+                     .encode('utf8'))
+        for flag_i in flags:
+            hash_.update(flag_i.encode('utf8') + b'\0')
+        for path_i in [ph.path(source)] + find_headers(source, include_dirs):
+            hash_.update(path_i.encode('utf8') + b'\0')
+            hash_.update(hashlib.sha256(path_i.bytes()).digest())
+        return hash_.hexdigest()
+
+    def _entry_prefix(self, source):
+        '''
+        Returns
+        -------
+        str
+            File name prefix of cache entries for source file.
+        '''
+        source = ph.path(source).realpath()
+        return hashlib.sha1(source.encode('utf8')).hexdigest()[:16] + '-'
+
+    def _entry_path(self, source, key):
+        return self.cache_dir.joinpath(self._entry_prefix(source) + key +
+                                       '.json')
+
+    def get(self, source, key):
+        '''
+        Parameters
+        ----------
+        source : str
+            Path to C++ source file.
+        key : str
+            Cache key (see :meth:`key`).
+
+        Returns
+        -------
+        dict or None
+            Cached abstract syntax tree, or ``None`` if no entry exists for
+            the key (or entry cannot be parsed).
+        '''
+        try:
+            with self._entry_path(source, key).open('r') as input_:
+                return json.load(input_)
+        except (IOError, ValueError):
+            return None
+
+    def set(self, source, key, cpp_ast_json):
+        '''
+        Write cache entry, replacing any previous entry for source file.
+
+        Parameters
+        ----------
+        source : str
+            Path to C++ source file.
+        key : str
+            Cache key (see :meth:`key`).
+        cpp_ast_json : dict
+            A JSON-serializable C++ abstract syntax tree.
+        '''
+        self.cache_dir.makedirs_p()
+        path = self._entry_path(source, key)
+        for stale_i in self.cache_dir.files(self._entry_prefix(source) +
+                                            '*.json'):
+            if stale_i != path:
+                stale_i.remove_p()
+        with path.open('w') as output:
+            json.dump(cpp_ast_json, output)
@@ -0,0 +1,212 @@
+'''
+Compact binary C++ abstract syntax tree file, with lazy loading.
+
+Each namespace of the abstract syntax tree is split into separate blobs
+(one per collection, e.g., ``members``, ``classes``, ``typedefs``), each
+stored as zlib-compressed compact JSON.  The file starts with an index of
+the namespace tree, recording the offset and size of each blob::
+
+    [magic (8 bytes)][index size (uint32)][index][blob][blob]...
+
+:func:`load` reads and decodes only the index; each blob is read from the
+file and decoded the first time it is accessed, so loading a single
+namespace only decodes that subtree.  The file is not held open between
+reads.
+'''
+import json
+import os
+import struct
+import zlib
+
+import six
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+__all__ = ['LazyNode', 'dump', 'load']
+
+
+MAGIC = b'CPPAST\x00\x01'
+INDEX_HEADER = struct.Struct('<I')  # [index size]
+
+
+def _encode(value):
+    data = json.dumps(value, separators=(',', ':'))
+    if isinstance(data, six.text_type):
+        data = data.encode('utf8')
+    return zlib.compress(data)
+
+
+def _decode(data):
+    return json.loads(zlib.decompress(data).decode('utf8'))
+
+
+def dump(cpp_ast_json, path):
+    '''
+    Write abstract syntax tree to compact binary file.
+
+    Parameters
+    ----------
+    cpp_ast_json : dict
+        A JSON-serializable C++ abstract syntax tree.
+    path : str
+        Output file path.
+    '''
+    blobs = []
+    offset = [0]
+
+    def index_node(node):
+        index = {'inline': {}, 'blobs': {}}
+        for key_i, value_i in node.items():
+            if key_i == 'namespaces':
+                index['namespaces'] = dict([(name_ij, index_node(node_ij))
+                                            for name_ij, node_ij in
+                                            value_i.items()])
+            elif isinstance(value_i, dict):
+                blob_i = _encode(value_i)
+                index['blobs'][key_i] = [offset[0], len(blob_i)]
+                blobs.append(blob_i)
+                offset[0] += len(blob_i)
+            else:
+                index['inline'][key_i] = value_i
+        return index
+
+    index = _encode(index_node(cpp_ast_json))
+    with open(path, 'wb') as output:
+        output.write(MAGIC)
+        output.write(INDEX_HEADER.pack(len(index)))
+        output.write(index)
+        for blob_i in blobs:
+            output.write(blob_i)
+
+
+class _Blob(object):
+    '''
+    Placeholder for a value that has not been decoded yet.
+    '''
+    def __init__(self, source, offset, size):
+        self.source = source
+        self.offset = offset
+        self.size = size
+
+    def load(self):
+        return _decode(self.source.read(self.offset, self.size))
+
+
+class _Source(object):
+    '''
+    Abstract syntax tree file, opened for each read so the file is never
+    locked (e.g., on Windows) and may be rewritten while a tree is loaded.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.stat = self._stat()
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime
+
+    def read(self, offset, size):
+        '''
+        Raises
+        ------
+        IOError
+            If file has changed since it was loaded.
+        '''
+        if self._stat() != self.stat:
+            raise IOError('Abstract syntax tree file has changed since it was '
+                          'loaded: {}'.format(self.path))
+        with open(self.path, 'rb') as input_:
+            input_.seek(offset)
+            return input_.read(size)
+
+
+class LazyNode(Mapping):
+    '''
+    Read-only mapping where values are decoded on first access.
+
+    Keys are available without decoding any values.  Values are decoded by
+    every access path (e.g., ``node[key]``, ``dict(node)``, ``**node``).  Use
+    :meth:`to_dict` to decode every value recursively (e.g., before
+    serializing to JSON).
+    '''
+    def __init__(self, values):
+        self._values = dict(values)
+
+    def __getitem__(self, key):
+        value = self._values[key]
+        if isinstance(value, _Blob):
+            value = value.load()
+            self._values[key] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return '<LazyNode keys={}>'.format(sorted(self._values))
+
+    def copy(self):
+        '''
+        Returns
+        -------
+        dict
+            Shallow copy, with every value decoded.
+        '''
+        return dict(self)
+
+    def to_dict(self):
+        '''
+        Returns
+        -------
+        dict
+            Plain dictionary, with every value decoded (recursively).
+        '''
+        return dict([(k, v.to_dict() if isinstance(v, LazyNode) else v)
+                     for k, v in self.items()])
+
+
+def _lazy_node(source, base, index):
+    values = dict(index['inline'])
+    for key_i, (offset_i, size_i) in index['blobs'].items():
+        values[key_i] = _Blob(source, base + offset_i, size_i)
+    # Namespaces key is kept even if empty, so the tree round-trips exactly.
+    if 'namespaces' in index:
+        values['namespaces'] = LazyNode([(name_i, _lazy_node(source, base,
+                                                             index_i))
+                                         for name_i, index_i in
+                                         index['namespaces'].items()])
+    return LazyNode(values)
+
+
+def load(path):
+    '''
+    Load abstract syntax tree from file.
+
+    Parameters
+    ----------
+    path : str
+        Path to abstract syntax tree file, either in compact binary format
+        (see :func:`dump`) or JSON format (e.g., ``cpp_ast.json``).
+
+    Returns
+    -------
+    collections.Mapping
+        C++ abstract syntax tree.
+
+        For a compact binary file, a :class:`LazyNode`, where each
+        collection (e.g., ``members``) is decoded on first access.
+    '''
+    with open(path, 'rb') as input_:
+        if input_.read(len(MAGIC)) != MAGIC:
+            input_.seek(0)
+            return json.loads(input_.read().decode('utf8'))
+        index_size, = INDEX_HEADER.unpack(input_.read(INDEX_HEADER.size))
+        index = _decode(input_.read(index_size))
+    base = len(MAGIC) + INDEX_HEADER.size + index_size
+    return _lazy_node(_Source(path), base, index)
@@ -0,0 +1,493 @@
+'''
+Asynchronous access to remote contexts using :mod:`asyncio`.
+
+Requires :mod:`asyncio` (Python 3.4+) or :mod:`trollius` (Python 2.7).
+'''
+from collections import deque
+
+import numpy as np
+
+try:
+    import asyncio
+except ImportError:
+    import trollius as asyncio
+
+from .context import (ADDRESS_OF_REQUEST, MEM_READ_BATCH_HEADER,
+                      MEM_READ_REQUEST, MEM_REGION_DTYPE, MEM_WRITE_HEADER,
+                      Context)
+from .op_codes import (OP_ADDRESS_OF, OP_MEM_READ, OP_MEM_READ_BATCH,
+                       OP_MEM_WRITE)
+from .packet_stream import PacketDecoder, encode_packet
+
+__all__ = ['AsyncRemoteContext']
+
+
+class AsyncRemoteContext(Context, asyncio.Protocol):
+    '''
+    Asynchronous access to public variables and fields within a remote
+    context (i.e., namespace), implemented as an :class:`asyncio.Protocol`.
+
+    Each request is tagged with a sequence ID (i.e., the packet ``iuid``),
+    which the remote device echoes in its response.  Responses are matched
+    to requests by sequence ID, so any number of reads and writes may be in
+    flight at once, on any number of devices, from a single thread.
+
+    All public methods return :class:`asyncio.Future` objects.
+
+    Parameters
+    ----------
+    cpp_ast_json : dict
+        A JSON-serializable C++ abstract syntax tree, as parsed by
+        `clang_helpers.clang_ast.parse_cpp_ast(..., format='json')`.
+    namespace : str, optional
+        A namespace specifier (e.g., ``"foo::bar"``) indicating the namespace
+        to expose.
+    loop : asyncio.AbstractEventLoop, optional
+        Event loop (default: :func:`asyncio.get_event_loop`).
+    timeout : float, optional
+        Maximum number of seconds to wait for each response.
+
+        A value of ``None`` waits indefinitely.
+    chunk_size : int, optional
+        Maximum number of bytes transferred per request (must fit in the
+        packet buffer of the remote device).
+    window : int, optional
+        Maximum number of :meth:`read_memory` chunk requests in flight at
+        once.
+
+    Examples
+    --------
+    Connect using `pyserial-asyncio`_::
+
+        >>> loop = asyncio.get_event_loop()
+        >>> transport, ctx = loop.run_until_complete(
+        ...     serial_asyncio.create_serial_connection(
+        ...         loop, lambda: AsyncRemoteContext(cpp_ast_json), 'COM3',
+        ...         baudrate=115200))
+        >>> loop.run_until_complete(ctx.read_attribute('foo'))
+
+    .. _pyserial-asyncio: https://pypi.org/project/pyserial-asyncio/
+    '''
+    def __init__(self, cpp_ast_json, namespace='', loop=None, timeout=1.,
+                 chunk_size=512, window=4):
+        super(AsyncRemoteContext, self).__init__(cpp_ast_json,
+                                                 namespace=namespace)
+        self._loop = loop if loop is not None else asyncio.get_event_loop()
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.window = window
+        self.transport = None
+        self._decoder = PacketDecoder()
+        self._addresses = {}
+        # Pending requests, as `(future, timeout handle)`, keyed by sequence
+        # ID.
+        self._pending = {}
+        self._iuid = 0
+
+    # ## asyncio.Protocol interface ##
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self._decoder.feed(data)
+        while True:
+            try:
+                packet = self._decoder.pop_packet()
+            except IOError:
+                # Corrupt packet; the corresponding request times out.
+                continue
+            if packet is None:
+                break
+            future, handle = self._pending.pop(packet.iuid, (None, None))
+            if future is None:
+                # Unsolicited packet, or response to request that timed out.
+                continue
+            if handle is not None:
+                handle.cancel()
+            if not future.done():
+                future.set_result(packet.data)
+
+    def connection_lost(self, exc):
+        self.transport = None
+        pending, self._pending = self._pending, {}
+        for future_i, handle_i in pending.values():
+            if handle_i is not None:
+                handle_i.cancel()
+            if not future_i.done():
+                future_i.set_exception(IOError('Connection lost.'))
+
+    # ## Request handling ##
+    def _future(self):
+        return asyncio.Future(loop=self._loop)
+
+    def _then(self, future, callback):
+        '''
+        Parameters
+        ----------
+        future : asyncio.Future
+            Future to chain.
+        callback : function
+            Function called with the result of :data:`future`.  If the
+            function returns a future, its result is propagated.
+
+        Returns
+        -------
+        asyncio.Future
+            Future resolved with return value of :data:`callback`, or with
+            the exception raised by :data:`future` or :data:`callback`.
+        '''
+        result = self._future()
+
+        def propagate(future_i):
+            if result.done():
+                return False
+            elif future_i.cancelled():
+                result.cancel()
+            elif future_i.exception() is not None:
+                result.set_exception(future_i.exception())
+            else:
+                return True
+            return False
+
+        def on_done(future_i):
+            if not propagate(future_i):
+                return
+            try:
+                value = callback(future_i.result())
+            except Exception as exception:
+                result.set_exception(exception)
+                return
+            if isinstance(value, asyncio.Future):
+                # Resolve with result of future returned by callback.
+                value.add_done_callback(lambda f: propagate(f) and
+                                        result.set_result(f.result()))
+            else:
+                result.set_result(value)
+        future.add_done_callback(on_done)
+        return result
+
+    def _next_iuid(self):
+        '''
+        Returns
+        -------
+        int
+            Next non-zero sequence ID not used by a pending request.
+        '''
+        if len(self._pending) >= 0xFFFF:
+            raise IOError('Too many requests in flight.')
+        while True:
+            self._iuid = self._iuid % 0xFFFF + 1
+            if self._iuid not in self._pending:
+                return self._iuid
+
+    def _send(self, payload, iuid=0):
+        if self.transport is None:
+            raise IOError('Not connected.')
+        self.transport.write(bytes(encode_packet(payload, iuid=iuid)))
+
+    def _request(self, payload):
+        '''
+        Parameters
+        ----------
+        payload : str
+            Request packet payload.
+
+        Returns
+        -------
+        asyncio.Future
+            Future resolved with response packet payload, or failed with
+            :class:`IOError` if no response was received within
+            :attr:`timeout` seconds.
+        '''
+        future = self._future()
+        iuid = self._next_iuid()
+        if self.timeout is None:
+            handle = None
+        else:
+            handle = self._loop.call_later(self.timeout, self._on_timeout,
+                                           iuid)
+        self._pending[iuid] = (future, handle)
+        try:
+            self._send(payload, iuid=iuid)
+        except Exception as exception:
+            del self._pending[iuid]
+            if handle is not None:
+                handle.cancel()
+            future.set_exception(exception)
+        return future
+
+    def _on_timeout(self, iuid):
+        future, handle = self._pending.pop(iuid, (None, None))
+        if future is not None and not future.done():
+            future.set_exception(IOError('Timed out waiting for response '
+                                         '(iuid={}, timeout={}s).'
+                                         .format(iuid, self.timeout)))
+
+    # ## Remote context operations ##
+    def address_of(self, attr):
+        '''
+        Parameters
+        ----------
+        attr : str
+            Name of attribute in remote context.
+
+        Returns
+        -------
+        asyncio.Future
+            Future resolved with address in memory of specified attribute.
+
+            Addresses are memoized after the first request.
+        '''
+        if attr in self._addresses:
+            future = self._future()
+            future.set_result(self._addresses[attr])
+            return future
+
+        def on_response(data):
+            address = self._decode_address(attr, data)
+            self._addresses[attr] = address
+            return address
+        return self._then(self._request(ADDRESS_OF_REQUEST
+                                        .pack(OP_ADDRESS_OF,
+                                              self._member_ids[attr],
+                                              self._name_hashes[attr])),
+                          on_response)
+
+    def prime_addresses(self):
+        '''
+        Resolve and memoize the address of every attribute by reading the
+        address table (one request per :attr:`chunk_size` bytes of table).
+
+        Returns
+        -------
+        asyncio.Future
+            Future resolved with mapping from each attribute name to address.
+        '''
+        def on_response(pages):
+            self._addresses.update(self._decode_address_table(pages))
+            return dict(self._addresses)
+        requests = self._address_table_requests(self.chunk_size)
+        return self._then(asyncio.gather(*[self._request(request_i)
+                                           for request_i in requests]),
+                          on_response)
+
+    def _mem_read(self, address, size):
+        return self._then(self._request(MEM_READ_REQUEST.pack(OP_MEM_READ,
+                                                              address, size)),
+                          lambda data: np.fromstring(data, dtype='uint8'))
+
+    def _mem_read_batch(self, regions):
+        regions = np.array(regions, dtype=MEM_REGION_DTYPE)
+        payload = (MEM_READ_BATCH_HEADER.pack(OP_MEM_READ_BATCH,
+                                              len(regions)) +
+                   regions.tobytes())
+        return self._then(self._request(payload),
+                          lambda data: np.fromstring(data, dtype='uint8'))
+
+    def read_memory(self, address, nbytes):
+        '''
+        Read a block of memory of arbitrary size from remote context.
+
+        The block is split into requests of at most :attr:`chunk_size` bytes,
+        with up to :attr:`window` requests in flight at once.
+
+        Returns
+        -------
+        asyncio.Future
+            Future resolved with data read, as ``np.array(dtype='uint8')``.
+        '''
+        output = np.empty(nbytes, dtype='uint8')
+        chunks = deque((offset_i, min(self.chunk_size, nbytes - offset_i))
+                       for offset_i in range(0, nbytes, self.chunk_size))
+        result = self._future()
+        remaining = [len(chunks)]
+
+        if not chunks:
+            result.set_result(output)
+            return result
+
+        def on_chunk(future_i, offset_i, size_i):
+            if result.done():
+                return
+            elif future_i.cancelled():
+                result.cancel()
+                return
+            elif future_i.exception() is not None:
+                result.set_exception(future_i.exception())
+                return
+            data = future_i.result()
+            if len(data) != size_i:
+                result.set_exception(IOError('Expected {} bytes in response, '
+                                             'received {}.'
+                                             .format(size_i, len(data))))
+                return
+            output[offset_i:offset_i + size_i] = np.frombuffer(data,
+                                                               dtype='uint8')
+            remaining[0] -= 1
+            if chunks:
+                send_next()
+            elif not remaining[0]:
+                result.set_result(output)
+
+        def send_next():
+            offset_i, size_i = chunks.popleft()
+            future_i = self._request(MEM_READ_REQUEST
+                                     .pack(OP_MEM_READ, address + offset_i,
+                                           size_i))
+            future_i.add_done_callback(lambda f: on_chunk(f, offset_i,
+                                                          size_i))
+
+        for i in range(min(self.window, len(chunks))):
+            send_next()
+        return result
+
+    def write_memory(self, address, data):
+        '''
+        Write a block of memory of arbitrary size to remote context.
+
+        The block is split into requests of at most :attr:`chunk_size` bytes.
+
+        Returns
+        -------
+        asyncio.Future
+            Future resolved once all requests have been written to the
+            transport.
+        '''
+        result = self._future()
+        try:
+            bytes_ = np.ascontiguousarray(data).view('uint8').ravel()
+            for offset_i in range(0, bytes_.size, self.chunk_size):
+                chunk_i = bytes_[offset_i:offset_i + self.chunk_size]
+                self._send(MEM_WRITE_HEADER.pack(OP_MEM_WRITE,
+                                                 address + offset_i,
+                                                 chunk_i.size) +
+                           chunk_i.tobytes())
+        except Exception as exception:
+            result.set_exception(exception)
+        else:
+            result.set_result(None)
+        return result
+
+    def read_attribute(self, attr):
+        '''
+        Parameters
+        ----------
+        attr : str
+            Name of attribute in remote context.
+
+        Returns
+        -------
+        asyncio.Future
+            Future resolved with value of specified attribute.
+
+        Raises
+        ------
+        TypeError
+            If attribute type is not supported (i.e., not a plain old data
+            type).
+        '''
+        np_dtype = self._dtypes[attr]
+        if np_dtype is None:
+            raise TypeError('Type not understood: {}'
+                            .format(self._attributes[attr]['type']))
+
+        def on_address(address):
+            if np_dtype.itemsize > self.chunk_size:
+                return self.read_memory(address, np_dtype.itemsize)
+            return self._mem_read(address, np_dtype.itemsize)
+        return self._then(self._then(self.address_of(attr), on_address),
+                          lambda data: data.view([('value',
+                                                   np_dtype)])[0]['value'])
+
+    def read_attributes(self):
+        '''
+        Read all attributes, issuing every batched read request at once.
+
+        Returns
+        -------
+        asyncio.Future
+            Future resolved with value of each attribute (``None`` for
+            attributes with unsupported types).
+        '''
+        values = dict.fromkeys(self._attributes)
+        np_dtype, batches = self._snapshot_layout(self.chunk_size)
+        if np_dtype is None:
+            result = self._future()
+            result.set_result(values)
+            return result
+
+        if len([name_i for name_i in np_dtype.names
+                if name_i not in self._addresses]) > 1:
+            addresses = self.prime_addresses()
+        else:
+            addresses = asyncio.gather(*[self.address_of(name_i)
+                                         for name_i in np_dtype.names])
+
+        def on_addresses(_):
+            data = np.empty(np_dtype.itemsize, dtype='uint8')
+
+            def on_batch(response, offset, size):
+                if response.size != size:
+                    raise IOError('Expected {} bytes in response, received '
+                                  '{}.'.format(size, response.size))
+                data[offset:offset + size] = response
+
+            futures = []
+            for batch_i in batches:
+                offset_i = np_dtype.fields[batch_i[0][0]][1]
+                size_i = sum([dtype_ij.itemsize
+                              for name_ij, dtype_ij in batch_i])
+                if size_i > self.chunk_size:
+                    future_i = self.read_memory(self._addresses
+                                                [batch_i[0][0]], size_i)
+                else:
+                    future_i = self._mem_read_batch([(self._addresses[name_ij],
+                                                      dtype_ij.itemsize)
+                                                     for name_ij, dtype_ij in
+                                                     batch_i])
+                futures.append(self._then(future_i, lambda r, o=offset_i,
+                                          s=size_i: on_batch(r, o, s)))
+
+            def on_data(_):
+                record = data.view(np_dtype)[0]
+                values.update((name_i, record[name_i])
+                              for name_i in np_dtype.names)
+                return values
+            return self._then(asyncio.gather(*futures), on_data)
+        return self._then(addresses, on_addresses)
+
+    def write_attribute(self, attr, value):
+        '''
+        Parameters
+        ----------
+        attr : str
+            Name of attribute in remote context.
+        value : type of attr
+            Value to set for specified attribute in remote context.
+
+        Returns
+        -------
+        asyncio.Future
+            Future resolved once the write request has been written to the
+            transport.
+
+        Raises
+        ------
+        AttributeError
+            If attribute is declared as ``const``.
+        TypeError
+            If attribute type is not supported (i.e., not a plain old data
+            type).
+        '''
+        attr_node = self._attributes[attr]
+        if attr_node['const']:
+            raise AttributeError('Attribute "{}" is read-only (declared as '
+                                 '"const").'.format(attr))
+        np_dtype = self._dtypes[attr]
+        if np_dtype is None:
+            raise TypeError('Type not understood: {}'
+                            .format(attr_node['type']))
+        buffer_ = np.zeros(1, dtype=[('value', np_dtype)])
+        buffer_['value'][0] = value
+        return self._then(self.address_of(attr),
+                          lambda address: self.write_memory(address, buffer_))
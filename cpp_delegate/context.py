@@ -1,20 +1,68 @@
-import hashlib
+from collections import OrderedDict, deque
+import contextlib
+import logging
+import struct
+import threading
+import time
 
 from pydash import py_ as py__
-import nadamq as nq
+import clang_helpers as ch
+import clang_helpers.clang_ast
 import nadamq.NadaMq
 import numpy as np
 import pydash as py_
 
 from .dir_mixin import DirMixIn
-from .address_of import get_attributes
+from .address_of import (get_attributes, get_member_ids, name_hash,
+                         parse_array_type)
 from .member_header import get_functions
+from .op_codes import (OP_ADDRESS_OF, OP_ADDRESS_TABLE, OP_CALL,
+                       OP_CALL_BATCH, OP_FIRMWARE_ID,
+                       OP_MEM_READ, OP_MEM_READ_BATCH, OP_MEM_WRITE,
+                       OP_MEM_WRITE_BATCH, OP_WATCH, operation_code)
+from .packet_stream import PacketReader, PacketWriter
+from .rpc import RemoteFunction, get_struct_format
 
 _fp = py__()
+logger = logging.getLogger(__name__)
+
+# Precompiled layouts of request payloads (packed, little-endian).
+OP_CODE_REQUEST = struct.Struct('<H')  # [op_code]
+# [op_code][member_id][name_hash]
+ADDRESS_OF_REQUEST = struct.Struct('<HHH')
+ADDRESS_TABLE_REQUEST = struct.Struct('<HHH')  # [op_code][offset][count]
+MEM_READ_REQUEST = struct.Struct('<HIH')  # [op_code][address][size]
+MEM_READ_BATCH_HEADER = struct.Struct('<HH')  # [op_code][count]
+MEM_WRITE_HEADER = struct.Struct('<HIH')  # [op_code][address][size]
+MEM_WRITE_BATCH_HEADER = struct.Struct('<HH')  # [op_code][count]
+WATCH_HEADER = struct.Struct('<HH')  # [op_code][count]
+CALL_BATCH_HEADER = struct.Struct('<HH')  # [op_code][count]
+# Layout of watch responses and notifications.
+WATCH_COUNT = struct.Struct('<H')  # [count]
+WATCH_INDEX = struct.Struct('<H')  # [index]
+MEM_REGION_DTYPE = np.dtype([('address', '<u4'), ('size', '<u2')])
+# Address table entry, i.e., `{uint16_t member_id; uint16_t name_hash;
+# void const *address;}`.
+ADDRESS_TABLE_DTYPE = np.dtype([('member_id', '<u2'), ('name_hash', '<u2'),
+                                ('address', '<u4')], align=True)
+
+
+# NumPy type of each C fundamental type (32-bit ARM ABI, e.g., Teensy).
+C_TYPES = {'bool': 'bool', 'char': 'int8', 'signed char': 'int8',
+           'unsigned char': 'uint8', 'short': 'int16',
+           'unsigned short': 'uint16', 'int': 'int32',
+           'unsigned int': 'uint32', 'long': 'int32',
+           'unsigned long': 'uint32', 'long long': 'int64',
+           'unsigned long long': 'uint64', 'float': 'float32',
+           'double': 'float64'}
 
 
 def get_np_dtype(type_name, default=False):
-    for type_i in (type_name, type_name[:-2]):
+    if type_name in C_TYPES:
+        return np.dtype(C_TYPES[type_name])
+    # Try type name as is, then without `_t` suffix (e.g., `uint8_t`).
+    for type_i in ((type_name, type_name[:-2]) if type_name.endswith('_t')
+                   else (type_name, )):
         try:
             return np.dtype(type_i)
         except TypeError:
@@ -26,8 +74,131 @@ def get_np_dtype(type_name, default=False):
             return default
 
 
-operation_code = lambda v: np.fromstring(hashlib.sha256(v).digest(),
-                                         dtype='uint8').view('uint16')[0]
+def get_type_dtype(cpp_ast_json, type_name, default=False):
+    '''
+    Parameters
+    ----------
+    cpp_ast_json : dict
+        JSON-serializable C++ abstract syntax tree.
+    type_name : str
+        C++ type spelling.
+    default : object, optional
+        Default return value if type is not supported.
+
+    Returns
+    -------
+    numpy.dtype
+        Type corresponding to:
+
+         - a scalar type (see :func:`get_np_dtype`);
+         - a constant-sized array (e.g., ``"uint16_t [4]"``), as a sub-array
+           type; or
+         - a plain old data ``struct``/``class``, as a structured type with C
+           alignment, where each field type is also supported.
+
+    Raises
+    ------
+    TypeError
+        If type is not supported and no :data:`default` is specified.
+    '''
+    try:
+        array_type = parse_array_type(type_name)
+        if array_type is not None:
+            element_type, shape = array_type
+            return np.dtype((get_type_dtype(cpp_ast_json, element_type),
+                             shape))
+        np_dtype = get_np_dtype(type_name, None)
+        if np_dtype is not None:
+            return np_dtype
+        class_node = ch.clang_ast.get_class_factory(cpp_ast_json)(type_name)
+        if not class_node:
+            raise TypeError('Type not understood: {}'.format(type_name))
+        fields = sorted([v for v in class_node.get('members', {}).values()
+                         if v.get('kind') not in ('FUNCTION_DECL',
+                                                  'CXX_METHOD',
+                                                  'FUNCTIONPROTO')
+                         and '()' not in v.get('type', '()')],
+                        key=lambda v: (py_.get(v, 'location.start.line'),
+                                       py_.get(v, 'location.start.column')))
+        if not fields:
+            raise TypeError('Type has no fields: {}'.format(type_name))
+        return np.dtype([(str(v['name']),
+                          get_attribute_dtype(cpp_ast_json, v))
+                         for v in fields], align=True)
+    except TypeError:
+        if default is False:
+            raise
+        return default
+
+
+def get_attribute_dtype(cpp_ast_json, node, default=False):
+    '''
+    Parameters
+    ----------
+    cpp_ast_json : dict
+        JSON-serializable C++ abstract syntax tree.
+    node : dict
+        Variable or field node.
+    default : object, optional
+        Default return value if type is not supported.
+
+    Returns
+    -------
+    numpy.dtype
+        Type of variable or field, resolving typedefs to the underlying type
+        if necessary (see :func:`get_type_dtype`).
+
+    Raises
+    ------
+    TypeError
+        If type is not supported and no :data:`default` is specified.
+    '''
+    for type_i in (node['type'], node.get('underlying_type')):
+        if type_i:
+            np_dtype = get_type_dtype(cpp_ast_json, type_i, None)
+            if np_dtype is not None:
+                return np_dtype
+    if default is False:
+        raise TypeError('Type not understood: {}'.format(node['type']))
+    return default
+
+
+def merge_writes(writes):
+    '''
+    Merge memory writes into contiguous segments.
+
+    Parameters
+    ----------
+    writes : list
+        List of ``(address, data)`` tuples, in the order the writes were
+        made, where ``data`` is a ``uint8`` array.
+
+    Returns
+    -------
+    list
+        List of ``(address, data)`` tuples, sorted by address, holding the
+        final contents of each contiguous (i.e., overlapping or adjacent)
+        range of written memory.  Where writes overlap, later writes take
+        precedence.
+    '''
+    # Find contiguous ranges.
+    ranges = []
+    for start_i, end_i in sorted((address_i, address_i + data_i.size)
+                                 for address_i, data_i in writes):
+        if ranges and start_i <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end_i)
+        else:
+            ranges.append([start_i, end_i])
+    segments = [(start_i, np.empty(end_i - start_i, dtype='uint8'))
+                for start_i, end_i in ranges]
+
+    # Apply writes in order.
+    starts = [start_i for start_i, end_i in ranges]
+    for address_i, data_i in writes:
+        j = np.searchsorted(starts, address_i, side='right') - 1
+        offset_ij = address_i - starts[j]
+        segments[j][1][offset_ij:offset_ij + data_i.size] = data_i
+    return segments
 
 
 def get_namespace_path(namespace_str):
@@ -36,6 +207,17 @@ def get_namespace_path(namespace_str):
             if parts_i else '')
 
 
+def _copy_value(value):
+    '''
+    Returns
+    -------
+    object
+        Copy of array or struct value (e.g., a view of a response buffer),
+        or :data:`value` itself if it is immutable (e.g., a scalar).
+    '''
+    return value.copy() if isinstance(value, (np.ndarray, np.void)) else value
+
+
 class Context(object):
     def __init__(self, cpp_ast_json, namespace=''):
         self.cpp_ast_json = cpp_ast_json
@@ -46,8 +228,179 @@ class Context(object):
         else:
             self.namespace = self.cpp_ast_json
         self._attributes = get_attributes(self.namespace['members'])
+        self._member_ids = get_member_ids(self._attributes)
+        self._name_hashes = dict([(k, name_hash(k)) for k in self._attributes])
+        # Type of each attribute (`None` if type is not supported).
+        self._dtypes = dict([(k, get_attribute_dtype(cpp_ast_json, v, None))
+                             for k, v in self._attributes.items()])
         self._functions = get_functions(self.namespace['members'])
 
+    def _get_remote_functions(self):
+        '''
+        Returns
+        -------
+        collections.OrderedDict
+            Proxy for each function exposed by the remote command switch,
+            keyed by function name.
+
+            Command indices follow the order of the ``CMD__<name>`` constants
+            generated by :func:`cpp_delegate.member_header.render`.  Only
+            functions whose arguments and result are all scalar types are
+            included.
+        '''
+        functions = OrderedDict()
+        for i, (name_i, node_i) in enumerate(py_.sort(self._functions)):
+            arg_dtypes_i = [get_attribute_dtype(self.cpp_ast_json, arg_ij,
+                                                None)
+                            for arg_ij in node_i['arguments']]
+            result_dtype_i = get_type_dtype(self.cpp_ast_json,
+                                            node_i['result_type'], None)
+            dtypes_i = [result_dtype_i] + arg_dtypes_i
+            if (any([dtype_ij is None for dtype_ij in dtypes_i]) or
+                    get_struct_format(dtypes_i) is None):
+                continue
+            functions[name_i] = \
+                RemoteFunction(self, name_i, i,
+                               [arg_ij['name']
+                                for arg_ij in node_i['arguments']],
+                               arg_dtypes_i, result_dtype_i)
+        return functions
+
+    def _address_table_requests(self, chunk_size):
+        '''
+        Parameters
+        ----------
+        chunk_size : int
+            Maximum number of bytes in each response.
+
+        Returns
+        -------
+        list
+            Payload of each ``address_table`` request needed to read the
+            address table, one page of at most :data:`chunk_size` bytes per
+            request.
+        '''
+        count = max(1, chunk_size // ADDRESS_TABLE_DTYPE.itemsize)
+        return [ADDRESS_TABLE_REQUEST.pack(OP_ADDRESS_TABLE, offset_i, count)
+                for offset_i in range(0, len(self._member_ids), count)]
+
+    def _decode_address(self, attr, data):
+        '''
+        Parameters
+        ----------
+        attr : str
+            Attribute name.
+        data : str
+            Payload of response to ``address_of`` request.
+
+        Returns
+        -------
+        int
+            Address in memory of attribute in remote context.
+
+        Raises
+        ------
+        IOError
+            If the remote context reports no address for the member ID and
+            name hash of the attribute (e.g., the firmware was generated from
+            a different abstract syntax tree).
+        '''
+        address = np.fromstring(data, dtype='uint32')[0]
+        if not address:
+            raise IOError('Remote context has no attribute `{}` (member '
+                          'ID=0x{:04x}); firmware does not match abstract '
+                          'syntax tree.'.format(attr, self._member_ids[attr]))
+        return address
+
+    def _decode_address_table(self, pages):
+        '''
+        Parameters
+        ----------
+        pages : list
+            Payload of response to each request from
+            :meth:`_address_table_requests`, i.e., an array of ``{uint16_t
+            member_id; uint16_t name_hash; void const *address;}`` entries.
+
+        Returns
+        -------
+        dict
+            Mapping from each attribute name to the corresponding address in
+            memory of remote context.
+
+        Raises
+        ------
+        IOError
+            If any page is empty (e.g., the page does not fit in the device
+            buffer), or if the table does not match the abstract syntax tree
+            (i.e., the address of an attribute is missing, or its name hash
+            differs).
+        '''
+        for i, page_i in enumerate(pages):
+            if not page_i:
+                raise IOError('Address table page {} of {} is empty: either '
+                              'the page is too large for the device buffer '
+                              '(reduce `chunk_size`), or the firmware has '
+                              'fewer attributes than the abstract syntax '
+                              'tree.'.format(i + 1, len(pages)))
+        table = np.fromstring(b''.join(pages), dtype=ADDRESS_TABLE_DTYPE)
+        # Remote address table is keyed by member ID.
+        entries = dict(zip(table['member_id'], table))
+        missing = [k for k, v in self._member_ids.items() if v not in entries]
+        if missing:
+            raise IOError('Address table is missing attributes: {}'
+                          .format(', '.join(sorted(missing))))
+        # Same member ID may be assigned to a different name if the firmware
+        # was generated from a different abstract syntax tree.
+        mismatched = [k for k, v in self._member_ids.items()
+                      if entries[v]['name_hash'] != self._name_hashes[k]]
+        if mismatched:
+            raise IOError('Address table does not match abstract syntax tree '
+                          '(name hash differs): {}'
+                          .format(', '.join(sorted(mismatched))))
+        return dict([(k, entries[v]['address'])
+                     for k, v in self._member_ids.items()])
+
+    def _snapshot_layout(self, chunk_size):
+        '''
+        Plan batched read of all supported attributes.
+
+        Parameters
+        ----------
+        chunk_size : int
+            Maximum number of bytes per request and per response.
+
+        Returns
+        -------
+        tuple
+            ``(np_dtype, batches)``, where ``np_dtype`` is a structured type
+            with one field per supported attribute (sorted by name), and
+            ``batches`` is a list of batches of consecutive fields, each a
+            list of ``(name, dtype)`` tuples.
+
+            Both the request and the response of each batch fit in a single
+            chunk, except for batches holding a single attribute larger than
+            a chunk.  ``np_dtype`` is ``None`` if no attribute is supported.
+        '''
+        fields = [(str(k), self._dtypes[k])
+                  for k in sorted(self._attributes.keys())
+                  if self._dtypes[k] is not None]
+        if not fields:
+            return None, []
+
+        max_regions = ((chunk_size - MEM_READ_BATCH_HEADER.size) //
+                       MEM_REGION_DTYPE.itemsize)
+        batches = []
+        batch_size = chunk_size
+        for name_i, dtype_i in fields:
+            if (dtype_i.itemsize > chunk_size or batch_size +
+                    dtype_i.itemsize > chunk_size or
+                    len(batches[-1]) >= max_regions):
+                batches.append([])
+                batch_size = 0
+            batches[-1].append((name_i, dtype_i))
+            batch_size += dtype_i.itemsize
+        return np.dtype(fields), batches
+
 
 class RemoteContext(Context, DirMixIn):
     '''
@@ -69,18 +422,126 @@ class RemoteContext(Context, DirMixIn):
         to expose.
 
         A value of ``""`` corresponds to the top-level namespace.
+    timeout : float, optional
+        Maximum number of seconds to wait for a response from the remote
+        device.
+
+        A value of ``None`` waits indefinitely.
+    poll_interval : float, optional
+        Number of seconds to sleep between polls of :data:`stream` while
+        waiting for a response.
+    address_cache : cpp_delegate.address_cache.AddressCache, optional
+        Persistent cache of attribute addresses.
+
+        If specified, addresses cached for the firmware ID reported by the
+        remote device are used without querying the device.  Otherwise, all
+        addresses are resolved by reading the address table (see
+        :meth:`prime_addresses`) and stored in the cache.
+
+        .. warning::
+            The cache is only safe if the firmware ID identifies the build,
+            e.g., as defined by :func:`cpp_delegate.dump_cpp_ast`.  The
+            fallback firmware ID (the build date and time of the generated
+            header) may be unchanged after rebuilding, so stale addresses
+            would be used.
+    chunk_size : int, optional
+        Maximum number of bytes transferred per request by
+        :meth:`read_memory`, :meth:`write_memory` and
+        :meth:`prime_addresses` (must fit in the packet buffer of the remote
+        device).
+    window : int, optional
+        Maximum number of :meth:`read_memory` chunk requests in flight at
+        once.
+    cache_ttl : float, optional
+        Enable local cache of attribute values read from remote device.
+
+        Cached values are served for up to :data:`cache_ttl` seconds
+        (``0`` only caches ``const`` attributes).  Values of ``const``
+        attributes never expire.  By default, values are not cached.
+    cache_ttls : dict, optional
+        Time-to-live (in seconds) of specific attributes, overriding
+        :data:`cache_ttl`.
+
+        Also enables the cache (e.g., ``cache_ttls={'foo': 5}`` caches
+        ``foo`` for 5 seconds and ``const`` attributes forever, and does not
+        cache other attributes).
 
     Attributes
     ----------
+    cache_stats : dict
+        Number of attribute reads served from cache (``hits``) and from the
+        remote device (``misses``) while cache is enabled.
     .<remote variable/field>
         An attribute corresponding to each public variable or field within the
         remote context :attr:`namespace`.
+
+    Notes
+    -----
+    Host-side attributes and methods (e.g., :attr:`timeout`, :attr:`window`,
+    :meth:`batch`, :meth:`watch`) shadow remote variables with the same name,
+    for both reading and writing.  Use :meth:`_read_attribute` and
+    :meth:`_write_attribute` to access a shadowed remote variable.
     '''
-    def __init__(self, stream, cpp_ast_json, namespace=''):
+    def __init__(self, stream, cpp_ast_json, namespace='', timeout=1.,
+                 poll_interval=.001, address_cache=None, chunk_size=512,
+                 window=4, cache_ttl=None, cache_ttls=None):
         self.stream = stream
+        self.cache_ttl = cache_ttl
+        self.cache_ttls = dict(cache_ttls or {})
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        # Cached value of each attribute, as `(time read, value)`.
+        self._cache = {}
+        self.chunk_size = chunk_size
+        self.window = window
+        self._reader = PacketReader(stream, timeout=timeout,
+                                    poll_interval=poll_interval)
+        # Request payloads are packed in place into a reusable buffer.
+        self._writer = PacketWriter(stream)
+        # Packet identifier of most recent pipelined request.
+        self._iuid = 0
         super(RemoteContext, self).__init__(cpp_ast_json, namespace=namespace)
-        self._addresses = dict([(k, self._address_of(str(k)))
-                                for k in sorted(self._attributes.keys())])
+        # Addresses are resolved on first access (see :meth:`_address`).
+        self._addresses = {}
+        self._remote_functions = self._get_remote_functions()
+        # Watched attributes, in device watch list order, as `(name, dtype)`.
+        self._watch_list = []
+        # Callbacks of each watched attribute.
+        self._watch_callbacks = {}
+        # Writes buffered by `batch`, per thread (see `_write_batch`).
+        self._batch_local = threading.local()
+
+        if address_cache is not None:
+            firmware_id = self._firmware_id()
+            addresses = address_cache.get(firmware_id, namespace)
+            if addresses is None:
+                self.prime_addresses()
+                address_cache.set(firmware_id, namespace, self._addresses)
+            else:
+                self._addresses.update(addresses)
+
+    @property
+    def timeout(self):
+        '''
+        Maximum number of seconds to wait for a response from the remote
+        device (``None`` waits indefinitely).
+        '''
+        return self._reader.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._reader.timeout = value
+
+    @property
+    def poll_interval(self):
+        '''
+        Number of seconds to sleep between polls of :attr:`stream` while
+        waiting for a response.
+        '''
+        return self._reader.poll_interval
+
+    @poll_interval.setter
+    def poll_interval(self, value):
+        self._reader.poll_interval = value
 
     def __dir__(self):
         '''
@@ -88,13 +549,18 @@ class RemoteContext(Context, DirMixIn):
 
         Allows, for example, tab completion for remote attributes in IPython.
         '''
-        return super(RemoteContext, self).__dir__() + self._attributes.keys()
+        return (super(RemoteContext, self).__dir__() +
+                self._attributes.keys() + self._remote_functions.keys())
 
     def __getattr__(self, attr):
         '''
         If :data:`attr` matches the name of a variable or field in the remote
         context, return the corresponding value.
 
+        If :data:`attr` matches the name of a function exposed by the remote
+        command switch, return a callable proxy (see
+        :class:`cpp_delegate.rpc.RemoteFunction`).
+
         Returns
         -------
         type of attr
@@ -109,6 +575,8 @@ class RemoteContext(Context, DirMixIn):
         '''
         if attr in self._attributes:
             return self._read_attribute(attr, None)
+        elif attr in self._remote_functions:
+            return self._remote_functions[attr]
         else:
             raise AttributeError
 
@@ -117,6 +585,9 @@ class RemoteContext(Context, DirMixIn):
         If :data:`attr` matches the name of a variable or field in the remote
         context, set the corresponding value.
 
+        Class attributes (e.g., properties) and existing instance attributes
+        take precedence over remote variables, as with :meth:`__getattr__`.
+
         Parameters
         ----------
         attr : str
@@ -134,11 +605,185 @@ class RemoteContext(Context, DirMixIn):
         --------
         :meth:`__getattr__`, :meth:`_read_attribute`
         '''
-        if hasattr(self, '_attributes') and attr in self._attributes:
+        if (attr in self.__dict__.get('_attributes', ()) and
+                attr not in self.__dict__ and not hasattr(type(self), attr)):
             self._write_attribute(attr, value)
         else:
             super(RemoteContext, self).__setattr__(attr, value)
 
+    def _call(self, function, args):
+        '''
+        Call function exposed by remote command switch.
+
+        Parameters
+        ----------
+        function : cpp_delegate.rpc.RemoteFunction
+            Function to call.
+        args : tuple
+            Function arguments, in declaration order.
+
+        Returns
+        -------
+        numpy scalar
+            Result returned by function.
+        '''
+        OP_CODE_REQUEST.pack_into(self._writer.payload, 0, OP_CALL)
+        length = function.pack_into(self._writer.payload,
+                                    OP_CODE_REQUEST.size, args)
+        return function.decode(self._request(length))
+
+    def call_batch(self, calls):
+        '''
+        Call several functions exposed by remote command switch, using as
+        few requests as fit in :attr:`chunk_size`.
+
+        Calls are made in order.
+
+        Parameters
+        ----------
+        calls : list
+            List of ``(function, args)`` tuples, where ``function`` is a
+            function name or :class:`cpp_delegate.rpc.RemoteFunction` and
+            ``args`` is a tuple of arguments (or a dictionary of keyword
+            arguments).
+
+        Returns
+        -------
+        list
+            Result returned by each call.
+
+        Examples
+        --------
+        >>> ctx.call_batch([('add', (1, 2)), (ctx.count, ())])
+        [3.0, 77]
+        '''
+        batches = [[]]
+        request_size = CALL_BATCH_HEADER.size
+        response_size = 0
+        for function_i, args_i in calls:
+            if not isinstance(function_i, RemoteFunction):
+                function_i = self._remote_functions[function_i]
+            if isinstance(args_i, dict):
+                args_i = function_i.get_args((), dict(args_i))
+            else:
+                args_i = function_i.get_args(tuple(args_i), {})
+            if batches[-1] and (request_size + function_i.size >
+                                self.chunk_size or response_size +
+                                function_i.result_dtype.itemsize >
+                                self.chunk_size):
+                batches.append([])
+                request_size = CALL_BATCH_HEADER.size
+                response_size = 0
+            batches[-1].append((function_i, args_i))
+            request_size += function_i.size
+            response_size += function_i.result_dtype.itemsize
+        return [result_i for batch_i in batches if batch_i
+                for result_i in self._call_batch(batch_i)]
+
+    def _call_batch(self, calls):
+        '''
+        Call several functions exposed by remote command switch in a single
+        request.
+
+        Parameters
+        ----------
+        calls : list
+            List of ``(function, args)`` tuples, where ``function`` is a
+            :class:`cpp_delegate.rpc.RemoteFunction` and ``args`` is a tuple
+            of arguments in declaration order.
+
+        Returns
+        -------
+        list
+            Result returned by each call.
+        '''
+        payload = self._writer.payload
+        CALL_BATCH_HEADER.pack_into(payload, 0, OP_CALL_BATCH, len(calls))
+        length = CALL_BATCH_HEADER.size
+        for function_i, args_i in calls:
+            length = function_i.pack_into(payload, length, args_i)
+        data = self._request(length)
+
+        size = sum([function_i.result_dtype.itemsize
+                    for function_i, args_i in calls])
+        if len(data) != size:
+            raise IOError('Expected {} bytes in response, received {}.'
+                          .format(size, len(data)))
+        results = []
+        offset = 0
+        for function_i, args_i in calls:
+            size_i = function_i.result_dtype.itemsize
+            results.append(function_i.decode(data[offset:offset + size_i]))
+            offset += size_i
+        return results
+
+    def _request(self, length):
+        '''
+        Send request packet and wait for the response packet.
+
+        Each request is tagged with a new packet identifier (see
+        :meth:`_next_iuid`); stale responses (e.g., a late response to a
+        request that timed out) are discarded.
+
+        Parameters
+        ----------
+        length : int
+            Length of request payload, which must already be packed into the
+            request buffer (i.e., ``self._writer.payload``).
+
+        Returns
+        -------
+        str
+            Response packet payload.
+
+        Raises
+        ------
+        IOError
+            If no complete response was received within :attr:`timeout`
+            seconds.
+        '''
+        iuid = self._next_iuid()
+        self._writer.write(length, iuid=iuid)
+        return self._read_response(iuid).data
+
+    def _read_response(self, iuid=None):
+        '''
+        Block until a response packet has been received.
+
+        Watch notifications (i.e., ``STREAM`` packets) received while waiting
+        are dispatched to the registered callbacks.
+
+        Parameters
+        ----------
+        iuid : int, optional
+            Packet identifier of request.  Responses with any other
+            identifier (i.e., responses to earlier requests) are discarded.
+
+            By default, the first response is returned.
+
+        Returns
+        -------
+        cpp_delegate.packet_stream.Packet
+            Response packet.
+        '''
+        while True:
+            packet = self._reader.read_packet()
+            if packet.type_ == nadamq.NadaMq.PACKET_TYPES.STREAM:
+                self._dispatch_notification(packet.data)
+            elif iuid is None or packet.iuid == iuid:
+                return packet
+
+    def _next_iuid(self):
+        '''
+        Returns
+        -------
+        int
+            Next non-zero packet identifier, used to match responses to
+            requests.
+        '''
+        self._iuid = self._iuid % 0xFFFF + 1
+        return self._iuid
+
     def _address_of(self, label):
         '''
         Parameters
@@ -150,19 +795,95 @@ class RemoteContext(Context, DirMixIn):
         -------
         int
             Address in memory of specified variable or field in remote context.
+
+        Notes
+        -----
+        The member is identified on the wire by its ``uint16`` member ID (see
+        :func:`cpp_delegate.address_of.get_member_ids`), rather than by name,
+        and the ``uint16`` hash of its name (see
+        :func:`cpp_delegate.address_of.name_hash`), checked by the firmware.
+
+        Raises
+        ------
+        IOError
+            If the firmware does not match the abstract syntax tree (see
+            :meth:`_decode_address`).
         '''
-        op_code = operation_code('address_of')
-        rec = np.rec.array([op_code, label], dtype=[('op_code', 'uint16'),
-                                                    ('address', 'S{}'
-                                                     .format(len(label)))])
-        packet = nq.NadaMq.cPacket(data=rec.tobytes(),
-                                   type_=nq.NadaMq.PACKET_TYPES.DATA)
-        self.stream.write(packet.tostring())
+        ADDRESS_OF_REQUEST.pack_into(self._writer.payload, 0, OP_ADDRESS_OF,
+                                     self._member_ids[label],
+                                     self._name_hashes[label])
+        return self._decode_address(label,
+                                    self._request(ADDRESS_OF_REQUEST.size))
 
-        while not self.stream.in_waiting:
-            pass
-        return np.fromstring(self.stream.read(self.stream.in_waiting),
-                             dtype='uint32')[0]
+    def _firmware_id(self):
+        '''
+        Returns
+        -------
+        str
+            Identifier of firmware build running on remote device.
+        '''
+        OP_CODE_REQUEST.pack_into(self._writer.payload, 0, OP_FIRMWARE_ID)
+        return (self._request(OP_CODE_REQUEST.size).rstrip(b'\0')
+                .decode('utf8'))
+
+    def _address_table(self):
+        '''
+        Resolve the address of every attribute, reading the address table in
+        pages of at most :attr:`chunk_size` bytes.
+
+        Returns
+        -------
+        dict
+            Mapping from each attribute name to the corresponding address in
+            memory of remote context.
+
+        See also
+        --------
+        :meth:`prime_addresses`
+        '''
+        pages = []
+        for request_i in self._address_table_requests(self.chunk_size):
+            self._writer.payload[:len(request_i)] = \
+                np.frombuffer(request_i, dtype='uint8')
+            pages.append(self._request(len(request_i)))
+        return self._decode_address_table(pages)
+
+    def _address(self, attr):
+        '''
+        Parameters
+        ----------
+        attr : str
+            Name of attribute in remote context.
+
+        Returns
+        -------
+        int
+            Address in memory of specified attribute in remote context.
+
+            The address is resolved using :meth:`_address_of` the first time
+            an attribute is accessed and memoized for subsequent calls.
+        '''
+        try:
+            return self._addresses[attr]
+        except KeyError:
+            address = self._address_of(str(attr))
+            self._addresses[attr] = address
+            return address
+
+    def prime_addresses(self):
+        '''
+        Resolve and memoize the address of every attribute in remote context
+        by reading the address table (one request per :attr:`chunk_size`
+        bytes of table).
+
+        Useful to avoid one request per attribute when most attributes will be
+        accessed.
+
+        See also
+        --------
+        :meth:`_address_table`, :meth:`_address`
+        '''
+        self._addresses.update(self._address_table())
 
     def _mem_read(self, address, size):
         '''
@@ -182,19 +903,39 @@ class RemoteContext(Context, DirMixIn):
         --------
         :meth:`_read_attribute`
         '''
-        op_code = operation_code('mem_read')
-        rec = np.rec.array([op_code, address, size],
-                           dtype=[('op_code', 'uint16'), ('address', 'uint32'),
-                                  ('size', 'uint16')])
-        packet = nq.NadaMq.cPacket(data=rec.tobytes(),
-                                   type_=nq.NadaMq.PACKET_TYPES.DATA)
+        MEM_READ_REQUEST.pack_into(self._writer.payload, 0, OP_MEM_READ,
+                                   address, size)
+        return np.fromstring(self._request(MEM_READ_REQUEST.size),
+                             dtype='uint8')
 
-        self.stream.write(packet.tostring())
+    def _mem_read_batch(self, regions):
+        '''
+        Read several memory regions in a single request.
 
-        while not self.stream.in_waiting:
-            pass
-        return np.fromstring(self.stream.read(self.stream.in_waiting),
-                             dtype='uint8')
+        Parameters
+        ----------
+        regions : list
+            List of ``(address, size)`` tuples, where ``address`` is a memory
+            address in remote context and ``size`` is the number of bytes to
+            read.
+
+        Returns
+        -------
+        np.array(dtype='uint8')
+            Data read from each region, concatenated in order.
+
+        See also
+        --------
+        :meth:`_mem_read`, :meth:`_read_attributes`
+        '''
+        payload = self._writer.payload
+        MEM_READ_BATCH_HEADER.pack_into(payload, 0, OP_MEM_READ_BATCH,
+                                        len(regions))
+        # Pack regions in place, directly after header.
+        offset = MEM_READ_BATCH_HEADER.size
+        length = offset + len(regions) * MEM_REGION_DTYPE.itemsize
+        payload[offset:length].view(MEM_REGION_DTYPE)[:] = regions
+        return np.fromstring(self._request(length), dtype='uint8')
 
     def _mem_write(self, address, data):
         '''
@@ -211,16 +952,245 @@ class RemoteContext(Context, DirMixIn):
         --------
         :meth:`_write_attribute`
         '''
-        op_code = operation_code('mem_write')
-        bytes_ = data.tobytes()
-        rec = np.rec.array([op_code, address, len(bytes_), bytes_],
-                           dtype=[('op_code', 'uint16'), ('address', 'uint32'),
-                                  ('size', 'uint16'),
-                                  ('bytes', 'S{}'.format(len(bytes_)))])
-        packet = nq.NadaMq.cPacket(data=rec.tobytes(),
-                                   type_=nq.NadaMq.PACKET_TYPES.DATA)
+        bytes_ = np.ascontiguousarray(data).view('uint8').ravel()
+        payload = self._writer.payload
+        length = MEM_WRITE_HEADER.size + bytes_.size
+        if length > payload.size:
+            raise ValueError('Data length is too large for request buffer, '
+                             '{} > {}'.format(bytes_.size, payload.size -
+                                              MEM_WRITE_HEADER.size))
+        MEM_WRITE_HEADER.pack_into(payload, 0, OP_MEM_WRITE, address,
+                                   bytes_.size)
+        # Copy data directly into request buffer, after header.
+        payload[MEM_WRITE_HEADER.size:length] = bytes_
+        self._writer.write(length, iuid=self._next_iuid())
+
+    def _mem_write_batch(self, segments):
+        '''
+        Write several memory regions in a single request.
+
+        Parameters
+        ----------
+        segments : list
+            List of ``(address, data)`` tuples, where ``address`` is a memory
+            address in remote context and ``data`` is a ``uint8`` array.
+
+        See also
+        --------
+        :meth:`_mem_write`, :meth:`batch`
+        '''
+        payload = self._writer.payload
+        MEM_WRITE_BATCH_HEADER.pack_into(payload, 0, OP_MEM_WRITE_BATCH,
+                                         len(segments))
+        # Pack regions in place, directly after header, followed by data.
+        offset = MEM_WRITE_BATCH_HEADER.size
+        length = offset + len(segments) * MEM_REGION_DTYPE.itemsize
+        payload[offset:length].view(MEM_REGION_DTYPE)[:] = \
+            [(address_i, data_i.size) for address_i, data_i in segments]
+        for address_i, data_i in segments:
+            payload[length:length + data_i.size] = data_i
+            length += data_i.size
+        self._writer.write(length, iuid=self._next_iuid())
+
+    @contextlib.contextmanager
+    def batch(self, verify=False):
+        '''
+        Buffer writes within block and send them when the block exits.
+
+        Adjacent and overlapping writes are merged into contiguous segments
+        (later writes take precedence), and segments are sent using as few
+        ``mem_write_batch`` requests as fit in :attr:`chunk_size`.  If the
+        block raises an exception, buffered writes are discarded.
+
+        Nested blocks are merged into the outermost block.
+
+        Only writes made by the thread that entered the block are buffered;
+        writes from other threads are sent immediately.
+
+        Parameters
+        ----------
+        verify : bool, optional
+            If ``True``, read back written memory after sending writes.
+
+        Raises
+        ------
+        IOError
+            If :data:`verify` is ``True`` and memory read back does not match
+            the written data.
+
+        Examples
+        --------
+        >>> with ctx.batch():
+        ...     ctx.gain = 2.5
+        ...     ctx.offset = 10
+        '''
+        if self._write_batch is not None:
+            yield
+            return
+        self._batch_local.writes = []
+        try:
+            yield
+            writes = self._batch_local.writes
+        finally:
+            self._batch_local.writes = None
+        if writes:
+            self._flush_writes(merge_writes(writes), verify)
+
+    @property
+    def _write_batch(self):
+        '''
+        Writes buffered by :meth:`batch` in the calling thread, as ``(address,
+        data)`` tuples (``None`` if the calling thread is not in a batch).
+        '''
+        return getattr(self._batch_local, 'writes', None)
+
+    def _flush_writes(self, segments, verify=False):
+        '''
+        Parameters
+        ----------
+        segments : list
+            List of ``(address, data)`` tuples (see :func:`merge_writes`).
+        verify : bool, optional
+            If ``True``, read back written memory after sending writes.
+
+        See also
+        --------
+        :meth:`batch`
+        '''
+        # Split segments into requests that fit in a chunk.
+        max_data = (self.chunk_size - MEM_WRITE_BATCH_HEADER.size -
+                    MEM_REGION_DTYPE.itemsize)
+        if max_data <= 0:
+            raise ValueError('Invalid chunk size: {}'.format(self.chunk_size))
+        requests = [[]]
+        length = MEM_WRITE_BATCH_HEADER.size
+        for address_i, data_i in segments:
+            for offset_ij in range(0, data_i.size, max_data):
+                data_ij = data_i[offset_ij:offset_ij + max_data]
+                if (length + MEM_REGION_DTYPE.itemsize + data_ij.size >
+                        self.chunk_size):
+                    requests.append([])
+                    length = MEM_WRITE_BATCH_HEADER.size
+                requests[-1].append((address_i + offset_ij, data_ij))
+                length += MEM_REGION_DTYPE.itemsize + data_ij.size
+
+        for request_i in requests:
+            self._mem_write_batch(request_i)
+        if self._cache:
+            for address_i, data_i in segments:
+                self._invalidate_range(address_i, data_i.size)
+
+        if verify:
+            mismatches = []
+            for request_i in requests:
+                data_i = self._mem_read_batch([(address_ij, data_ij.size)
+                                               for address_ij, data_ij in
+                                               request_i])
+                offset = 0
+                for address_ij, data_ij in request_i:
+                    if not np.array_equal(data_i[offset:offset +
+                                                 data_ij.size], data_ij):
+                        mismatches.append(address_ij)
+                    offset += data_ij.size
+            if mismatches:
+                raise IOError('Memory read back does not match written data '
+                              'at: {}'.format(', '.join('0x{:08x}'.format(a)
+                                                        for a in
+                                                        mismatches)))
+
+    def read_memory(self, address, nbytes):
+        '''
+        Read a block of memory of arbitrary size from remote context.
+
+        The block is split into requests of at most :attr:`chunk_size` bytes.
+        Up to :attr:`window` requests are kept in flight at once, and each
+        response is copied directly into its slot of the output array.
+
+        Parameters
+        ----------
+        address : int
+            Memory address in remote context.
+        nbytes : int
+            Number of bytes to read.
+
+        Returns
+        -------
+        np.array(dtype='uint8')
+            Data read from remote context.
+
+        Raises
+        ------
+        IOError
+            If a response is missing, does not match its request, or has an
+            unexpected length.
+
+        See also
+        --------
+        :meth:`write_memory`, :meth:`_mem_read`
+        '''
+        if not 0 < self.chunk_size <= min(0xFFFF, self._writer.payload.size):
+            raise ValueError('Invalid chunk size: {}'.format(self.chunk_size))
+        output = np.empty(nbytes, dtype='uint8')
+        chunks = deque((offset_i, min(self.chunk_size, nbytes - offset_i))
+                       for offset_i in range(0, nbytes, self.chunk_size))
+        in_flight = deque()
+
+        while chunks or in_flight:
+            # Fill window with chunk requests.
+            while chunks and len(in_flight) < self.window:
+                offset_i, size_i = chunks.popleft()
+                iuid_i = self._next_iuid()
+                MEM_READ_REQUEST.pack_into(self._writer.payload, 0,
+                                           OP_MEM_READ, address + offset_i,
+                                           size_i)
+                self._writer.write(MEM_READ_REQUEST.size, iuid=iuid_i)
+                in_flight.append((iuid_i, offset_i, size_i))
+
+            # Responses arrive in request order.
+            iuid_i, offset_i, size_i = in_flight.popleft()
+            packet = self._read_response(iuid_i)
+            if len(packet.data) != size_i:
+                raise IOError('Unexpected response to read of {} bytes at '
+                              '0x{:08x} (iuid={}): iuid={}, {} bytes'
+                              .format(size_i, address + offset_i, iuid_i,
+                                      packet.iuid, len(packet.data)))
+            output[offset_i:offset_i + size_i] = \
+                np.frombuffer(packet.data, dtype='uint8')
+        return output
+
+    def write_memory(self, address, data):
+        '''
+        Write a block of memory of arbitrary size to remote context.
+
+        The block is split into requests of at most :attr:`chunk_size` bytes.
+
+        Within a :meth:`batch` block, the write is buffered until the end of
+        the block.
 
-        self.stream.write(packet.tostring())
+        Parameters
+        ----------
+        address : int
+            Memory address in remote context.
+        data : numpy.array-like
+            Array or :module:`numpy` data type.
+
+        See also
+        --------
+        :meth:`read_memory`, :meth:`_mem_write`, :meth:`batch`
+        '''
+        if not 0 < self.chunk_size <= min(0xFFFF, self._writer.payload.size -
+                                          MEM_WRITE_HEADER.size):
+            raise ValueError('Invalid chunk size: {}'.format(self.chunk_size))
+        bytes_ = np.ascontiguousarray(data).view('uint8').ravel()
+        if self._cache:
+            self._invalidate_range(address, bytes_.size)
+        if self._write_batch is not None:
+            # Buffer write until end of batch.
+            self._write_batch.append((address, bytes_.copy()))
+            return
+        for offset_i in range(0, bytes_.size, self.chunk_size):
+            self._mem_write(address + offset_i,
+                            bytes_[offset_i:offset_i + self.chunk_size])
 
     def _read_attribute(self, attr, *args):
         '''
@@ -241,15 +1211,97 @@ class RemoteContext(Context, DirMixIn):
         '''
         has_default = True if args else False
 
-        address = self._addresses[attr]
-        try:
-            np_dtype = get_np_dtype(self._attributes[attr]['type'])
-        except TypeError:
+        np_dtype = self._dtypes[attr]
+        if np_dtype is None:
             if has_default:
                 return args[0]
-            raise
-        data = self._mem_read(address, np_dtype.itemsize)
-        return data.view(np_dtype)[0]
+            raise TypeError('Type not understood: {}'
+                            .format(self._attributes[attr]['type']))
+        cache_ttl = self._cache_ttl(attr)
+        if cache_ttl is not None:
+            value = self._cached_value(attr)
+            if value is not None:
+                return value
+        if np_dtype.itemsize > self.chunk_size:
+            data = self.read_memory(self._address(attr), np_dtype.itemsize)
+        else:
+            data = self._mem_read(self._address(attr), np_dtype.itemsize)
+        # Array and struct values are views of the received bytes.
+        value = data.view([('value', np_dtype)])[0]['value']
+        if cache_ttl is not None:
+            self._cache[attr] = (time.time(), _copy_value(value))
+        return value
+
+    def _cache_ttl(self, attr):
+        '''
+        Parameters
+        ----------
+        attr : str
+            Name of attribute in remote context.
+
+        Returns
+        -------
+        float or None
+            Time-to-live of cached values of attribute, in seconds (infinite
+            for ``const`` attributes), or ``None`` if attribute is not cached.
+        '''
+        if self.cache_ttl is None and not self.cache_ttls:
+            return None
+        elif self._attributes[attr]['const']:
+            return float('inf')
+        return self.cache_ttls.get(attr, self.cache_ttl)
+
+    def _cached_value(self, attr):
+        '''
+        Parameters
+        ----------
+        attr : str
+            Name of attribute in remote context.
+
+        Returns
+        -------
+        type of attr or None
+            Cached value of attribute, or ``None`` if no value is cached or
+            the cached value has expired.
+
+            Updates :attr:`cache_stats`.
+        '''
+        try:
+            read_time, value = self._cache[attr]
+        except KeyError:
+            pass
+        else:
+            if time.time() - read_time <= self._cache_ttl(attr):
+                self.cache_stats['hits'] += 1
+                # Copy, so cached value cannot be modified by caller.
+                return _copy_value(value)
+        self.cache_stats['misses'] += 1
+        return None
+
+    def invalidate_cache(self, attrs=None):
+        '''
+        Discard cached attribute values.
+
+        Parameters
+        ----------
+        attrs : list, optional
+            Names of attributes to discard (default: all attributes).
+        '''
+        if attrs is None:
+            self._cache.clear()
+        else:
+            for attr_i in attrs:
+                self._cache.pop(attr_i, None)
+
+    def _invalidate_range(self, address, size):
+        '''
+        Discard cached values of attributes overlapping a memory range.
+        '''
+        for attr_i in list(self._cache.keys()):
+            address_i = self._addresses.get(attr_i)
+            if (address_i is not None and address_i < address + size and
+                    address < address_i + self._dtypes[attr_i].itemsize):
+                self._cache.pop(attr_i, None)
 
     def _read_attributes(self):
         '''
@@ -261,12 +1313,51 @@ class RemoteContext(Context, DirMixIn):
             For each attribute, if type is not supported (i.e., not a plain old
             data type), value is set to ``None``.
 
+            Array and struct values are views of the received bytes.
+
         See also
         --------
         :meth:`_write_attribute`
         '''
-        return py_.map_values(self._attributes, lambda v, k:
-                              self._read_attribute(k, None))
+        values = dict.fromkeys(self._attributes)
+
+        # Batches of consecutive attributes, each read using a single
+        # request (attributes larger than a chunk are read using
+        # `read_memory`).
+        np_dtype, batches = self._snapshot_layout(self.chunk_size)
+        if np_dtype is None:
+            return values
+
+        if len([name_i for name_i in np_dtype.names
+                if name_i not in self._addresses]) > 1:
+            # Resolve all missing addresses by reading the address table.
+            self.prime_addresses()
+
+        data = np.empty(np_dtype.itemsize, dtype='uint8')
+        for batch_i in batches:
+            offset_i = np_dtype.fields[batch_i[0][0]][1]
+            size_i = sum([dtype_ij.itemsize for name_ij, dtype_ij in batch_i])
+            if size_i > self.chunk_size:
+                response_i = self.read_memory(self._address(batch_i[0][0]),
+                                              size_i)
+            else:
+                response_i = self._mem_read_batch([(self._address(name_ij),
+                                                    dtype_ij.itemsize)
+                                                   for name_ij, dtype_ij in
+                                                   batch_i])
+            if response_i.size != size_i:
+                raise IOError('Expected {} bytes in response, received {}.'
+                              .format(size_i, response_i.size))
+            data[offset_i:offset_i + size_i] = response_i
+
+        # Decode all attributes in a single pass.
+        record = data.view(np_dtype)[0]
+        values.update((name_i, record[name_i]) for name_i in np_dtype.names)
+        read_time = time.time()
+        self._cache.update((name_i, (read_time, _copy_value(values[name_i])))
+                           for name_i in np_dtype.names
+                           if self._cache_ttl(name_i) is not None)
+        return values
 
     def _write_attribute(self, attr, value):
         '''
@@ -287,7 +1378,6 @@ class RemoteContext(Context, DirMixIn):
         --------
         :meth:`_read_attribute`
         '''
-        address = self._addresses[attr]
         attr_node = self._attributes[attr]
         if attr_node['const']:
             location = attr_node['location']
@@ -296,6 +1386,164 @@ class RemoteContext(Context, DirMixIn):
                                  .format(attr, location['file'],
                                          location['start']['line'],
                                          location['start']['column']))
-        np_dtype = get_np_dtype(attr_node['type'])
-        value = np_dtype.type(value)
-        self._mem_write(address, value)
+        np_dtype = self._dtypes[attr]
+        if np_dtype is None:
+            raise TypeError('Type not understood: {}'
+                            .format(attr_node['type']))
+        buffer_ = np.zeros(1, dtype=[('value', np_dtype)])
+        buffer_['value'][0] = value
+        self.write_memory(self._address(attr), buffer_)
+
+    def watch(self, attrs, callback):
+        '''
+        Ask the remote device to report changes to the specified attributes.
+
+        The device compares each watched attribute against a shadow copy once
+        per main loop iteration and pushes a notification (i.e., a ``STREAM``
+        packet) only when a value changes (see
+        :func:`cpp_delegate.memory_header.render`), so no polling requests
+        are sent.
+
+        Notifications are dispatched while waiting for responses to other
+        requests, or by calling :meth:`poll_notifications`.
+
+        Parameters
+        ----------
+        attrs : list
+            Names of attributes to watch.
+        callback : function
+            Function called as ``callback(attr, value)`` each time the value
+            of a watched attribute changes.
+
+            Exceptions raised by the callback are logged, not propagated, so
+            a failing callback cannot abort the request that was waiting for
+            a response when the notification arrived.
+
+        Raises
+        ------
+        TypeError
+            If attribute type is not supported (i.e., not a plain old data
+            type).
+        IOError
+            If the remote device rejected the watch list (e.g., too many
+            attributes).
+
+        See also
+        --------
+        :meth:`unwatch`
+        '''
+        for attr_i in attrs:
+            if self._dtypes[attr_i] is None:
+                raise TypeError('Type not understood: {}'
+                                .format(self._attributes[attr_i]['type']))
+        for attr_i in attrs:
+            callbacks_i = self._watch_callbacks.setdefault(attr_i, [])
+            if callback not in callbacks_i:
+                callbacks_i.append(callback)
+        self._update_watch_list()
+
+    def unwatch(self, attrs=None, callback=None):
+        '''
+        Stop reporting changes to watched attributes.
+
+        Parameters
+        ----------
+        attrs : list, optional
+            Names of attributes to stop watching (default: all watched
+            attributes).
+        callback : function, optional
+            Only remove specified callback (default: all callbacks).
+        '''
+        if attrs is None:
+            attrs = list(self._watch_callbacks.keys())
+        for attr_i in attrs:
+            callbacks_i = self._watch_callbacks.get(attr_i, [])
+            if callback is None:
+                del callbacks_i[:]
+            elif callback in callbacks_i:
+                callbacks_i.remove(callback)
+            if not callbacks_i:
+                self._watch_callbacks.pop(attr_i, None)
+        self._update_watch_list()
+
+    def _update_watch_list(self):
+        '''
+        Replace watch list on remote device with attributes that have at
+        least one callback.
+        '''
+        watch_list = [(attr_i, self._dtypes[attr_i])
+                      for attr_i in sorted(self._watch_callbacks.keys())]
+        if len([attr_i for attr_i, dtype_i in watch_list
+                if attr_i not in self._addresses]) > 1:
+            self.prime_addresses()
+        # Resolve addresses first, since `_address_of` requests reuse the
+        # request buffer.
+        regions = [(self._address(attr_i), dtype_i.itemsize)
+                   for attr_i, dtype_i in watch_list]
+        payload = self._writer.payload
+        WATCH_HEADER.pack_into(payload, 0, OP_WATCH, len(watch_list))
+        offset = WATCH_HEADER.size
+        length = offset + len(watch_list) * MEM_REGION_DTYPE.itemsize
+        payload[offset:length].view(MEM_REGION_DTYPE)[:] = regions
+        # Device clears its watch list if the new list is rejected.
+        self._watch_list = []
+        count, = WATCH_COUNT.unpack(self._request(length))
+        if count != len(watch_list):
+            raise IOError('Remote device rejected watch list of {} '
+                          'attributes ({} bytes).'
+                          .format(len(watch_list),
+                                  sum([dtype_i.itemsize
+                                       for attr_i, dtype_i in watch_list])))
+        self._watch_list = watch_list
+
+    def _dispatch_notification(self, data):
+        '''
+        Decode watch notification and call registered callbacks.
+
+        Parameters
+        ----------
+        data : str
+            Notification payload, i.e.,
+            ``[count: uint16][[index: uint16][value] * count]``.
+        '''
+        count, = WATCH_COUNT.unpack_from(data, 0)
+        offset = WATCH_COUNT.size
+        for i in range(count):
+            index_i, = WATCH_INDEX.unpack_from(data, offset)
+            offset += WATCH_INDEX.size
+            if index_i >= len(self._watch_list):
+                # Stale notification (e.g., sent before watch list changed).
+                return
+            attr_i, dtype_i = self._watch_list[index_i]
+            value_i = (np.frombuffer(data, dtype=[('value', dtype_i)],
+                                     count=1, offset=offset)[0]['value'])
+            offset += dtype_i.itemsize
+            for callback_ij in list(self._watch_callbacks.get(attr_i, [])):
+                try:
+                    callback_ij(attr_i, value_i)
+                except Exception:
+                    # Notification may be dispatched while waiting for a
+                    # response, which must still be read.
+                    logger.exception('Error in watch callback for `%s`.',
+                                     attr_i)
+
+    def poll_notifications(self):
+        '''
+        Dispatch watch notifications received so far, without blocking.
+
+        Returns
+        -------
+        int
+            Number of notifications dispatched.
+        '''
+        bytes_waiting = self.stream.in_waiting
+        if bytes_waiting:
+            self._reader.feed(self.stream.read(bytes_waiting))
+        count = 0
+        while True:
+            packet = self._reader.pop_packet()
+            if packet is None:
+                return count
+            elif packet.type_ == nadamq.NadaMq.PACKET_TYPES.STREAM:
+                self._dispatch_notification(packet.data)
+                count += 1
@@ -0,0 +1,299 @@
+from collections import deque
+
+import numpy as np
+
+from .context import (MEM_READ_BATCH_HEADER, MEM_READ_REQUEST,
+                      MEM_REGION_DTYPE, MEM_WRITE_HEADER, Context)
+from .op_codes import OP_MEM_READ, OP_MEM_READ_BATCH, OP_MEM_WRITE
+from .packet_stream import PacketReader, encode_packet
+
+__all__ = ['DevicePool']
+
+
+class DevicePool(Context):
+    '''
+    Access the same remote context (i.e., namespace) on several identical
+    devices at once.
+
+    The abstract syntax tree is parsed, and attribute addresses resolved,
+    once for all devices.  Each request is framed once and written to every
+    device before any response is read, so devices process requests in
+    parallel.
+
+    Parameters
+    ----------
+    streams : list
+        Serial connection to each remote device (see
+        :class:`cpp_delegate.context.RemoteContext`).
+
+        All devices must run the same firmware.
+    cpp_ast_json : dict
+        A JSON-serializable C++ abstract syntax tree, as parsed by
+        `clang_helpers.clang_ast.parse_cpp_ast(..., format='json')`.
+    namespace : str, optional
+        A namespace specifier (e.g., ``"foo::bar"``) indicating the namespace
+        to expose.
+    timeout : float, optional
+        Maximum number of seconds to wait for each response.
+
+        A value of ``None`` waits indefinitely.
+    poll_interval : float, optional
+        Number of seconds to sleep between polls of each stream while waiting
+        for a response.
+    chunk_size : int, optional
+        Maximum number of bytes transferred per request (must fit in the
+        packet buffer of the remote devices).
+    window : int, optional
+        Maximum number of requests in flight at once on each device.
+
+    Examples
+    --------
+    >>> pool = DevicePool([serial.Serial(port_i, baudrate=115200)
+    ...                    for port_i in ('COM3', 'COM4', 'COM5')],
+    ...                   cpp_ast_json)
+    >>> snapshot = pool.read_attributes()
+    >>> snapshot.foo  # Value of `foo` on each device.
+    '''
+    def __init__(self, streams, cpp_ast_json, namespace='', timeout=1.,
+                 poll_interval=.001, chunk_size=512, window=4):
+        super(DevicePool, self).__init__(cpp_ast_json, namespace=namespace)
+        self.streams = list(streams)
+        self.chunk_size = chunk_size
+        self.window = window
+        self._readers = [PacketReader(stream_i, timeout=timeout,
+                                      poll_interval=poll_interval)
+                         for stream_i in self.streams]
+        self._iuid = 0
+        self._addresses = {}
+
+    def __len__(self):
+        return len(self.streams)
+
+    def _next_iuid(self):
+        self._iuid = self._iuid % 0xFFFF + 1
+        return self._iuid
+
+    def _transfer(self, requests):
+        '''
+        Send each request to every device and collect the responses.
+
+        Parameters
+        ----------
+        requests : list
+            List of request payloads (as ``str``).
+
+        Returns
+        -------
+        list
+            For each device, the list of response payloads, in request order.
+
+        Raises
+        ------
+        IOError
+            If a response is missing or does not match its request.
+        '''
+        requests = deque(requests)
+        in_flight = deque()
+        responses = [[] for stream_i in self.streams]
+
+        while requests or in_flight:
+            # Fill window with requests, sent to every device.
+            while requests and len(in_flight) < self.window:
+                iuid_i = self._next_iuid()
+                packet_i = bytes(encode_packet(requests.popleft(),
+                                               iuid=iuid_i))
+                for stream_j in self.streams:
+                    stream_j.write(packet_i)
+                in_flight.append(iuid_i)
+
+            # Responses from each device arrive in request order.
+            iuid_i = in_flight.popleft()
+            for j, reader_j in enumerate(self._readers):
+                packet_ij = reader_j.read_packet()
+                if packet_ij.iuid != iuid_i:
+                    raise IOError('Unexpected response from device {} '
+                                  '(iuid={}): iuid={}'
+                                  .format(j, iuid_i, packet_ij.iuid))
+                responses[j].append(packet_ij.data)
+        return responses
+
+    def prime_addresses(self):
+        '''
+        Resolve the address of every attribute by reading the address table
+        of each device (one request per :attr:`chunk_size` bytes of table).
+
+        Raises
+        ------
+        IOError
+            If the addresses reported by the devices differ (i.e., the
+            devices are not running the same firmware).
+        '''
+        requests = self._address_table_requests(self.chunk_size)
+        tables = [self._decode_address_table(responses_i)
+                  for responses_i in self._transfer(requests)]
+        for i, table_i in enumerate(tables[1:]):
+            if table_i != tables[0]:
+                raise IOError('Addresses reported by device {} do not match '
+                              'device 0.'.format(i + 1))
+        self._addresses.update(tables[0])
+
+    def _address(self, attr):
+        if attr not in self._addresses:
+            self.prime_addresses()
+        return self._addresses[attr]
+
+    def read_memory(self, address, nbytes):
+        '''
+        Parameters
+        ----------
+        address : int
+            Memory address in remote context.
+        nbytes : int
+            Number of bytes to read.
+
+        Returns
+        -------
+        np.array(dtype='uint8')
+            Data read from each device, with shape ``(len(self), nbytes)``.
+        '''
+        chunks = [(offset_i, min(self.chunk_size, nbytes - offset_i))
+                  for offset_i in range(0, nbytes, self.chunk_size)]
+        responses = self._transfer([MEM_READ_REQUEST.pack(OP_MEM_READ,
+                                                          address + offset_i,
+                                                          size_i)
+                                    for offset_i, size_i in chunks])
+        return self._stack(responses, nbytes)
+
+    def _stack(self, responses, nbytes):
+        '''
+        Concatenate responses from each device into one row per device.
+        '''
+        output = np.empty((len(self), nbytes), dtype='uint8')
+        for i, responses_i in enumerate(responses):
+            data_i = b''.join(responses_i)
+            if len(data_i) != nbytes:
+                raise IOError('Expected {} bytes from device {}, received {}.'
+                              .format(nbytes, i, len(data_i)))
+            output[i] = np.frombuffer(data_i, dtype='uint8')
+        return output
+
+    def write_memory(self, address, data):
+        '''
+        Write the same block of memory to every device.
+
+        Parameters
+        ----------
+        address : int
+            Memory address in remote context.
+        data : numpy.array-like
+            Array or :module:`numpy` data type.
+        '''
+        bytes_ = np.ascontiguousarray(data).view('uint8').ravel()
+        for offset_i in range(0, bytes_.size, self.chunk_size):
+            chunk_i = bytes_[offset_i:offset_i + self.chunk_size]
+            packet_i = bytes(encode_packet(MEM_WRITE_HEADER
+                                           .pack(OP_MEM_WRITE,
+                                                 address + offset_i,
+                                                 chunk_i.size) +
+                                           chunk_i.tobytes()))
+            for stream_j in self.streams:
+                stream_j.write(packet_i)
+
+    def read_attribute(self, attr):
+        '''
+        Parameters
+        ----------
+        attr : str
+            Name of attribute in remote context.
+
+        Returns
+        -------
+        numpy.ndarray
+            Value of specified attribute on each device, i.e., an array of
+            length ``len(self)``.
+
+        Raises
+        ------
+        TypeError
+            If attribute type is not supported (i.e., not a plain old data
+            type).
+        '''
+        np_dtype = self._dtypes[attr]
+        if np_dtype is None:
+            raise TypeError('Type not understood: {}'
+                            .format(self._attributes[attr]['type']))
+        data = self.read_memory(self._address(attr), np_dtype.itemsize)
+        return data.view([('value', np_dtype)])[:, 0]['value']
+
+    def read_attributes(self):
+        '''
+        Read all supported attributes from every device, using the same
+        batched requests as
+        :meth:`cpp_delegate.context.RemoteContext._read_attributes`.
+
+        Returns
+        -------
+        numpy.recarray
+            Record array of length ``len(self)``, with one field per
+            supported attribute (sorted by name), or ``None`` if no attribute
+            is supported.
+        '''
+        np_dtype, batches = self._snapshot_layout(self.chunk_size)
+        if np_dtype is None:
+            return None
+        if any(name_i not in self._addresses for name_i in np_dtype.names):
+            self.prime_addresses()
+
+        requests = []
+        for batch_i in batches:
+            size_i = sum([dtype_ij.itemsize for name_ij, dtype_ij in batch_i])
+            address_i = self._addresses[batch_i[0][0]]
+            if size_i > self.chunk_size:
+                requests.extend([MEM_READ_REQUEST
+                                 .pack(OP_MEM_READ, address_i + offset_ij,
+                                       min(self.chunk_size,
+                                           size_i - offset_ij))
+                                 for offset_ij in range(0, size_i,
+                                                        self.chunk_size)])
+            else:
+                regions_i = np.array([(self._addresses[name_ij],
+                                       dtype_ij.itemsize)
+                                      for name_ij, dtype_ij in batch_i],
+                                     dtype=MEM_REGION_DTYPE)
+                requests.append(MEM_READ_BATCH_HEADER
+                                .pack(OP_MEM_READ_BATCH, regions_i.size) +
+                                regions_i.tobytes())
+        # Responses are concatenated in field order.
+        data = self._stack(self._transfer(requests), np_dtype.itemsize)
+        return data.view(np_dtype)[:, 0].view(np.recarray)
+
+    def write_attribute(self, attr, value):
+        '''
+        Set the same value for an attribute on every device.
+
+        Parameters
+        ----------
+        attr : str
+            Name of attribute in remote context.
+        value : type of attr
+            Value to set for specified attribute on each device.
+
+        Raises
+        ------
+        AttributeError
+            If attribute is declared as ``const``.
+        TypeError
+            If attribute type is not supported (i.e., not a plain old data
+            type).
+        '''
+        attr_node = self._attributes[attr]
+        if attr_node['const']:
+            raise AttributeError('Attribute "{}" is read-only (declared as '
+                                 '"const").'.format(attr))
+        np_dtype = self._dtypes[attr]
+        if np_dtype is None:
+            raise TypeError('Type not understood: {}'
+                            .format(attr_node['type']))
+        buffer_ = np.zeros(1, dtype=[('value', np_dtype)])
+        buffer_['value'][0] = value
+        self.write_memory(self._address(attr), buffer_)
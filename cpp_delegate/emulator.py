@@ -0,0 +1,414 @@
+from collections import deque
+import random
+import time
+
+import nadamq.NadaMq
+import numpy as np
+
+from .context import (ADDRESS_OF_REQUEST, ADDRESS_TABLE_DTYPE,
+                      ADDRESS_TABLE_REQUEST, CALL_BATCH_HEADER,
+                      MEM_READ_BATCH_HEADER, MEM_READ_REQUEST,
+                      MEM_REGION_DTYPE, MEM_WRITE_BATCH_HEADER,
+                      MEM_WRITE_HEADER,
+                      OP_CODE_REQUEST, WATCH_COUNT, WATCH_HEADER, WATCH_INDEX,
+                      Context)
+from .op_codes import OP_CODES
+from .packet_stream import PacketDecoder, encode_packet
+from .rpc import CALL_COMMAND
+
+__all__ = ['DeviceEmulator']
+
+
+class DeviceEmulator(Context):
+    '''
+    Emulate a remote device running firmware generated from a C++ abstract
+    syntax tree.
+
+    Attributes of the exposed namespace are laid out in a ``uint8`` memory
+    array, and requests are handled the same way as by the generated
+    firmware (see :mod:`cpp_delegate.address_of`,
+    :mod:`cpp_delegate.memory_header` and :mod:`cpp_delegate.member_header`),
+    using the same NadaMq packets and operation codes.
+
+    The emulator provides the subset of the :class:`serial.Serial` interface
+    used by remote contexts (i.e., ``write``, ``read`` and ``in_waiting``),
+    so it may be passed as the stream of a
+    :class:`cpp_delegate.context.RemoteContext` (or any other context).
+
+    Parameters
+    ----------
+    cpp_ast_json : dict
+        A JSON-serializable C++ abstract syntax tree, as parsed by
+        `clang_helpers.clang_ast.parse_cpp_ast(..., format='json')`.
+    namespace : str, optional
+        A namespace specifier (e.g., ``"foo::bar"``) indicating the namespace
+        to expose.
+    functions : dict, optional
+        Python implementation of functions exposed by the command switch,
+        keyed by function name.
+    latency : float, optional
+        Number of seconds the device takes to process each request.
+    bandwidth : float, optional
+        Link bandwidth, in bytes per second (default: unlimited).
+    jitter : float, optional
+        Maximum number of seconds of random delay added to each response.
+    seed : int, optional
+        Seed of random delays.
+    firmware_id : str, optional
+        Firmware ID reported by device.
+    base_address : int, optional
+        Address of first attribute.
+    timeout : float, optional
+        Number of seconds :meth:`read` waits for the requested number of
+        bytes (``None`` waits indefinitely).
+    buffer_size : int, optional
+        Size of device response buffer, in bytes (default: unlimited).
+
+        As in the generated firmware, a response that does not fit in the
+        buffer is empty.
+
+    Attributes
+    ----------
+    memory : numpy.ndarray
+        Emulated device memory (``uint8``), starting at
+        :attr:`base_address`.
+    addresses : dict
+        Address of each attribute (attributes of unsupported types have no
+        storage).
+    stats : dict
+        Number of packets and bytes received and sent.
+
+    Examples
+    --------
+    >>> device = DeviceEmulator(cpp_ast_json, latency=200e-6,
+    ...                         bandwidth=1e6)
+    >>> device.set('foo', 42)
+    >>> ctx = RemoteContext(device, cpp_ast_json)
+    >>> ctx.foo
+    42
+    '''
+    def __init__(self, cpp_ast_json, namespace='', functions=None,
+                 latency=0., bandwidth=None, jitter=0., seed=None,
+                 firmware_id='emulator', base_address=0x20000000,
+                 timeout=0., buffer_size=None):
+        super(DeviceEmulator, self).__init__(cpp_ast_json,
+                                             namespace=namespace)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.jitter = jitter
+        self.firmware_id = firmware_id
+        self.base_address = base_address
+        self.timeout = timeout
+        self.buffer_size = buffer_size
+        self._random = random.Random(seed)
+
+        # Lay out attributes (sorted by name), aligned as by C compiler.
+        self.addresses = {}
+        offset = 0
+        for name_i in sorted(self._attributes.keys()):
+            dtype_i = self._dtypes[name_i]
+            # Attributes of unsupported types have an address, but no
+            # storage.
+            offset += -offset % (dtype_i.alignment if dtype_i is not None
+                                 else 4)
+            self.addresses[name_i] = base_address + offset
+            offset += dtype_i.itemsize if dtype_i is not None else 0
+        self.memory = np.zeros(max(offset, 1), dtype='uint8')
+
+        self.functions = dict(functions or {})
+        # Function proxies (for request/response layouts), keyed by command.
+        self._commands = dict([(function_i.command, function_i)
+                               for function_i in
+                               self._get_remote_functions().values()])
+        self._watch_regions = []
+        self._watch_shadow = []
+
+        self._decoder = PacketDecoder()
+        # Pending output, as `(time available, bytes)`.
+        self._output = deque()
+        self._output_buffer = bytearray()
+        # Time at which link is next free, in each direction.
+        self._rx_free = 0.
+        self._tx_free = 0.
+        self.stats = {'rx_packets': 0, 'rx_bytes': 0, 'tx_packets': 0,
+                      'tx_bytes': 0}
+        self._handlers = {OP_CODES['address_of']: self._address_of,
+                          OP_CODES['address_table']: self._address_table,
+                          OP_CODES['firmware_id']: self._firmware_id,
+                          OP_CODES['mem_read']: self._mem_read,
+                          OP_CODES['mem_read_batch']: self._mem_read_batch,
+                          OP_CODES['mem_write']: self._mem_write,
+                          OP_CODES['mem_write_batch']: self._mem_write_batch,
+                          OP_CODES['watch']: self._watch,
+                          OP_CODES['call']: self._call,
+                          OP_CODES['call_batch']: self._call_batch}
+
+    # ## Emulated memory ##
+    def _memory_view(self, address, size):
+        '''
+        Returns
+        -------
+        numpy.ndarray or None
+            View of emulated memory, or ``None`` if range is out of bounds.
+        '''
+        offset = address - self.base_address
+        if offset < 0 or offset + size > self.memory.size:
+            return None
+        return self.memory[offset:offset + size]
+
+    def get(self, attr):
+        '''
+        Returns
+        -------
+        type of attr
+            Value of attribute in emulated memory.
+        '''
+        dtype = self._dtypes[attr]
+        return (self._memory_view(self.addresses[attr], dtype.itemsize)
+                .view([('value', dtype)])[0]['value'])
+
+    def set(self, attr, value):
+        '''
+        Set value of attribute in emulated memory (e.g., to emulate a change
+        made by the firmware).
+        '''
+        dtype = self._dtypes[attr]
+        buffer_ = np.zeros(1, dtype=[('value', dtype)])
+        buffer_['value'][0] = value
+        self._memory_view(self.addresses[attr], dtype.itemsize)[:] = \
+            buffer_.view('uint8')
+
+    # ## Serial interface ##
+    def write(self, data):
+        '''
+        Receive bytes from host and queue response to each complete request.
+
+        Returns
+        -------
+        int
+            Number of bytes written.
+        '''
+        data = (data.tobytes() if isinstance(data, memoryview)
+                else bytes(data))
+        now = time.time()
+        self.stats['rx_bytes'] += len(data)
+        self._rx_free = max(now, self._rx_free) + self._transfer_time(data)
+        self._decoder.feed(data)
+        while True:
+            try:
+                packet = self._decoder.pop_packet()
+            except IOError:
+                # Corrupt packet; firmware drops it.
+                continue
+            if packet is None:
+                break
+            self.stats['rx_packets'] += 1
+            response = self._handle(packet.data)
+            if response is not None:
+                self._send(response, packet.iuid,
+                           self._rx_free + self.latency +
+                           self._random.uniform(0, self.jitter))
+        return len(data)
+
+    def _transfer_time(self, data):
+        return len(data) / float(self.bandwidth) if self.bandwidth else 0.
+
+    def _send(self, payload, iuid=0, ready_time=None,
+              type_=nadamq.NadaMq.PACKET_TYPES.DATA):
+        packet = encode_packet(payload, iuid=iuid, type_=type_)
+        if ready_time is None:
+            ready_time = time.time()
+        self._tx_free = (max(ready_time, self._tx_free) +
+                         self._transfer_time(packet))
+        self._output.append((self._tx_free, bytes(packet)))
+        self.stats['tx_packets'] += 1
+        self.stats['tx_bytes'] += len(packet)
+
+    def _update_output(self):
+        if self._watch_regions:
+            self.tick()
+        now = time.time()
+        while self._output and self._output[0][0] <= now:
+            self._output_buffer.extend(self._output.popleft()[1])
+
+    @property
+    def in_waiting(self):
+        '''
+        Number of response bytes available to read.
+        '''
+        self._update_output()
+        return len(self._output_buffer)
+
+    def read(self, size=1):
+        '''
+        Read up to :data:`size` response bytes, waiting up to
+        :attr:`timeout` seconds for :data:`size` bytes to become available.
+        '''
+        start = time.time()
+        while self.in_waiting < size:
+            if self._output:
+                delay = self._output[0][0] - time.time()
+            else:
+                delay = None
+            if (self.timeout is not None and
+                    (delay is None or
+                     time.time() + delay - start > self.timeout)):
+                break
+            time.sleep(max(delay, 0) if delay is not None else .001)
+        data = bytes(self._output_buffer[:size])
+        del self._output_buffer[:size]
+        return data
+
+    def reset_input_buffer(self):
+        self._output.clear()
+        del self._output_buffer[:]
+
+    def close(self):
+        pass
+
+    # ## Request handlers ##
+    def _handle(self, data):
+        '''
+        Returns
+        -------
+        str or None
+            Response payload, or ``None`` if request has no response.
+        '''
+        if len(data) < OP_CODE_REQUEST.size:
+            return None
+        op_code, = OP_CODE_REQUEST.unpack_from(data, 0)
+        handler = self._handlers.get(op_code)
+        if handler is None:
+            return None
+        response = handler(data)
+        if (response is not None and self.buffer_size is not None and
+                len(response) > self.buffer_size):
+            return b''
+        return response
+
+    def _address_of(self, data):
+        op_code, member_id, name_hash = ADDRESS_OF_REQUEST.unpack_from(data, 0)
+        for name_i, member_id_i in self._member_ids.items():
+            if (member_id_i == member_id and
+                    self._name_hashes[name_i] == name_hash):
+                return np.uint32(self.addresses.get(name_i, 0)).tobytes()
+        return np.uint32(0).tobytes()
+
+    def _address_table(self, data):
+        if len(data) < ADDRESS_TABLE_REQUEST.size:
+            return b''
+        op_code, offset, count = ADDRESS_TABLE_REQUEST.unpack_from(data, 0)
+        table = np.array(sorted([(self._member_ids[name_i],
+                                  self._name_hashes[name_i], address_i)
+                                 for name_i, address_i in
+                                 self.addresses.items()]),
+                         dtype=ADDRESS_TABLE_DTYPE)
+        return table[offset:offset + count].tobytes()
+
+    def _firmware_id(self, data):
+        return self.firmware_id.encode('utf8')
+
+    def _mem_read(self, data):
+        op_code, address, size = MEM_READ_REQUEST.unpack_from(data, 0)
+        view = self._memory_view(address, size)
+        return b'' if view is None else view.tobytes()
+
+    def _regions(self, data, offset, count):
+        return np.frombuffer(data, dtype=MEM_REGION_DTYPE, count=count,
+                             offset=offset)
+
+    def _mem_read_batch(self, data):
+        op_code, count = MEM_READ_BATCH_HEADER.unpack_from(data, 0)
+        output = []
+        for address_i, size_i in self._regions(data,
+                                               MEM_READ_BATCH_HEADER.size,
+                                               count):
+            view_i = self._memory_view(address_i, size_i)
+            if view_i is None:
+                return b''
+            output.append(view_i.tobytes())
+        return b''.join(output)
+
+    def _mem_write(self, data):
+        op_code, address, size = MEM_WRITE_HEADER.unpack_from(data, 0)
+        view = self._memory_view(address, size)
+        if view is not None:
+            view[:] = np.frombuffer(data, dtype='uint8', count=size,
+                                    offset=MEM_WRITE_HEADER.size)
+
+    def _mem_write_batch(self, data):
+        op_code, count = MEM_WRITE_BATCH_HEADER.unpack_from(data, 0)
+        offset = MEM_WRITE_BATCH_HEADER.size
+        regions = self._regions(data, offset, count)
+        offset += regions.nbytes
+        for address_i, size_i in regions:
+            view_i = self._memory_view(address_i, size_i)
+            if view_i is not None:
+                view_i[:] = np.frombuffer(data, dtype='uint8', count=size_i,
+                                          offset=offset)
+            offset += size_i
+
+    def _watch(self, data):
+        op_code, count = WATCH_HEADER.unpack_from(data, 0)
+        regions = self._regions(data, WATCH_HEADER.size, count)
+        views = [self._memory_view(address_i, size_i)
+                 for address_i, size_i in regions]
+        if any([view_i is None for view_i in views]):
+            views = []
+        self._watch_regions = views
+        self._watch_shadow = [view_i.copy() for view_i in views]
+        return WATCH_COUNT.pack(len(views))
+
+    def tick(self):
+        '''
+        Emulate one firmware main loop iteration, i.e., send a notification
+        for any watched region that changed.
+        '''
+        changed = [(i, view_i) for i, (view_i, shadow_i)
+                   in enumerate(zip(self._watch_regions, self._watch_shadow))
+                   if not np.array_equal(view_i, shadow_i)]
+        if not changed:
+            return
+        payload = [WATCH_COUNT.pack(len(changed))]
+        for i, view_i in changed:
+            self._watch_shadow[i][:] = view_i
+            payload.extend([WATCH_INDEX.pack(i), view_i.tobytes()])
+        self._send(b''.join(payload),
+                   type_=nadamq.NadaMq.PACKET_TYPES.STREAM)
+
+    def _run_command(self, data, offset):
+        '''
+        Returns
+        -------
+        tuple
+            ``(response, offset)``, where ``response`` is the packed result
+            and ``offset`` is the offset of the first byte after the command
+            request.
+        '''
+        command, = CALL_COMMAND.unpack_from(data, offset)
+        function = self._commands.get(command)
+        if function is None or function.__name__ not in self.functions:
+            raise ValueError('Unsupported command: {}'.format(command))
+        args = function.request.unpack_from(data, offset + CALL_COMMAND.size)
+        result = self.functions[function.__name__](*args)
+        return (np.array(result, dtype=function.result_dtype).tobytes(),
+                offset + function.size)
+
+    def _call(self, data):
+        try:
+            return self._run_command(data, OP_CODE_REQUEST.size)[0]
+        except ValueError:
+            return b''
+
+    def _call_batch(self, data):
+        op_code, count = CALL_BATCH_HEADER.unpack_from(data, 0)
+        offset = CALL_BATCH_HEADER.size
+        output = []
+        for i in range(count):
+            try:
+                response_i, offset = self._run_command(data, offset)
+            except ValueError:
+                # Malformed request; firmware responds with empty array.
+                return b''
+            output.append(response_i)
+        return b''.join(output)
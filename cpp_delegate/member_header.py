@@ -24,6 +24,24 @@ typedef struct __attribute__((packed)) {
 {%- for name_i, member_i in py_.sort(members) %}
 const int CMD__{{ name_i }} = {{ loop.index0 }};
 {%- endfor %}
+
+const uint16_t CMD_COUNT = {{ members|length }};
+
+// Size of request struct of each command (zero if function takes no
+// arguments), indexed by command.
+const uint16_t CMD_REQUEST_SIZES[] = {
+{%- for name_i, member_i in py_.sort(members) %}
+  {{ 'sizeof(' + name_i + '__Request)' if member_i.arguments else '0' }},
+{%- endfor %}
+};
+
+// Large enough to hold `[command][request]` or response of any command.
+union CallBuffer {
+{%- for name_i, member_i in py_.sort(members) %}
+  uint8_t {{ name_i }}__request[2 + sizeof({{ name_i }}__Request)];
+  {{ name_i }}__Response {{ name_i }}__response;
+{%- endfor %}
+};
 '''.strip())
 
 member_switch_template = jinja2.Template(r'''
@@ -59,6 +77,132 @@ inline UInt8Array test(uint32_t value, UInt8Array request_arr) {
     }
     return result;
 }
+
+'''.strip())
+
+member_call_template = jinja2.Template(r'''
+inline UInt8Array call(UInt8Array request_arr) {
+    /*
+     * Call function identified by command index.
+     *
+     * Parameters
+     * ----------
+     * request_arr : UInt8Array
+     *     Request message in the form:
+     *
+     *         [op_code: uint16][command: uint16][<name>__Request]
+     *
+     * Returns
+     * -------
+     * UInt8Array
+     *     ``<name>__Response`` of called function (written in place of the
+     *     request).
+     */
+    if (request_arr.length < 4) {
+        request_arr.length = 0;
+        return request_arr;
+    }
+    uint16_t command = *reinterpret_cast<uint16_t *>(&request_arr.data[2]);
+    // Skip op code, so request struct starts at `data[2]`.
+    UInt8Array command_arr;
+    command_arr.data = &request_arr.data[2];
+    command_arr.length = request_arr.length - 2;
+    return test(command, command_arr);
+}
+
+
+inline UInt8Array call_batch(UInt8Array request_arr, UInt8Array buffer) {
+    /*
+     * Call several functions, in order.
+     *
+     * Parameters
+     * ----------
+     * request_arr : UInt8Array
+     *     Request message in the form:
+     *
+     *         [op_code: uint16][count: uint16][[command: uint16][<name>__Request] * count]
+     * buffer : UInt8Array
+     *     Buffer to write responses to (must **not** overlap with
+     *     ``request_arr``).
+     *
+     * Returns
+     * -------
+     * UInt8Array
+     *     ``<name>__Response`` of each call, concatenated in request order.
+     *     If the request is malformed or the responses do not fit in
+     *     ``buffer``, the returned array has a length of zero (calls that
+     *     were already made are not undone).
+     */
+    UInt8Array output = buffer;
+    output.length = 0;
+    if (request_arr.length < 4) { return output; }
+    uint16_t count = *reinterpret_cast<uint16_t *>(&request_arr.data[2]);
+    uint32_t offset = 4;
+    uint32_t length = 0;
+    CallBuffer call_buffer;
+
+    for (uint16_t i = 0; i < count; i++) {
+        if (offset + 2 > request_arr.length) { return output; }
+        uint16_t command = *reinterpret_cast<uint16_t *>
+            (&request_arr.data[offset]);
+        if (command >= CMD_COUNT) { return output; }
+        uint16_t size = 2 + CMD_REQUEST_SIZES[command];
+        if (offset + size > request_arr.length) { return output; }
+        // Copy request, since response is written in place of request.
+        memcpy(&call_buffer, &request_arr.data[offset], size);
+        offset += size;
+
+        UInt8Array command_arr;
+        command_arr.data = reinterpret_cast<uint8_t *>(&call_buffer);
+        command_arr.length = sizeof(call_buffer);
+        UInt8Array result = test(command, command_arr);
+        if (length + result.length > buffer.length) { return output; }
+        memcpy(&output.data[length], result.data, result.length);
+        length += result.length;
+    }
+    output.length = length;
+    return output;
+}
+'''.strip())
+
+
+member_table_template = jinja2.Template(r'''
+{% for name_i, member_i in py_.sort(members) %}
+static void {{ name_i }}__thunk(uint8_t *data) {
+    // {{ member_i.location }}
+    {%- if member_i.arguments %}
+    {{ name_i }}__Request &request = *(reinterpret_cast<{{ name_i }}__Request *>
+                                       (&data[2]));
+    {%- endif %}
+    {{ name_i }}__Response response;
+    response.result = {{ name_i }}({% for a in member_i.arguments %}{{ ', ' if loop.index0 > 0 else ''}}/* {{ a.type }} */ request.{{ a.name }}{% endfor %});
+    *(reinterpret_cast<{{ name_i }}__Response *>(&data[0])) = response;
+}
+{% endfor %}
+
+struct CommandEntry {
+    void (*thunk)(uint8_t *data);
+    uint16_t request_size;
+    uint16_t response_size;
+};
+
+// Thunk and request/response sizes of each command, indexed by command
+// (constant, so placed in flash on ARM targets).
+const CommandEntry COMMAND_TABLE[] = {
+{%- for name_i, member_i in py_.sort(members) %}
+    { &{{ name_i }}__thunk, {{ 'sizeof(' + name_i + '__Request)' if member_i.arguments else '0' }}, sizeof({{ name_i }}__Response) },
+{%- endfor %}
+};
+
+inline UInt8Array test(uint32_t value, UInt8Array request_arr) {
+    UInt8Array result = request_arr;
+    if (value < CMD_COUNT) {
+        CommandEntry const &entry = COMMAND_TABLE[value];
+        entry.thunk(request_arr.data);
+        result.length = entry.response_size;
+    }
+    return result;
+}
 '''.strip())
 
 
@@ -72,7 +216,38 @@ def get_functions(members):
             and all([a['name'] for a in v['arguments']])]
 
 
-def render(functions):
+def render(functions, mode='switch'):
+    '''
+    Parameters
+    ----------
+    functions : list
+        List of ``(name, node)`` function tuples (see :func:`get_functions`).
+    mode : str, optional
+        Command dispatch strategy:
+
+         - ``'switch'``: a ``switch`` statement with one ``case`` per
+           command.
+         - ``'table'``: a constant table holding a thunk function pointer and
+           the request/response sizes of each command, indexed by command.
+
+        GCC already lowers the dense ``switch`` to a jump table, so both
+        modes dispatch in constant time.  The table trades a smaller
+        ``.text`` section for a larger ``.rodata`` section and an indirect
+        call per dispatch; compare both on the target before switching.
+
+    Returns
+    -------
+    str
+        C++ header defining request/response structs, ``CMD__<name>``
+        constants and a ``test(command, request_arr)`` dispatch function.
+    '''
+    if mode == 'switch':
+        dispatch_template = member_switch_template
+    elif mode == 'table':
+        dispatch_template = member_table_template
+    else:
+        raise ValueError('Unsupported mode: `{}`.  Must be one of: '
+                         '`switch`, `table`'.format(mode))
     header = io.BytesIO()
 
     print >> header, '''
@@ -81,8 +256,10 @@ def render(functions):
     print >> header, str(member_structs_template.render(members=functions,
                                                         py_=py_))
     print >> header, '\n'
-    print >> header, str(member_switch_template.render(members=functions,
-                                                       py_=py_))
+    print >> header, str(dispatch_template.render(members=functions,
+                                                  py_=py_))
+    print >> header, '\n'
+    print >> header, str(member_call_template.render())
     print >> header, '''
 #endif  // #ifndef ___MEMBER_HEADER__H___'''
     return header.getvalue()
@@ -0,0 +1,248 @@
+import jinja2
+
+__all__ = ['render']
+
+
+template = '''
+#ifndef ___MEMORY_HEADER__H___
+#define ___MEMORY_HEADER__H___
+
+#include <string.h>
+#include <stdint.h>
+#include <CArrayDefs.h>
+
+
+struct __attribute__((packed)) MemRegion {
+    uint32_t address;
+    uint16_t size;
+};
+
+
+inline UInt8Array mem_read_batch(UInt8Array request_arr, UInt8Array buffer) {
+    /*
+     * Copy the contents of several memory regions to ``buffer``.
+     *
+     * Parameters
+     * ----------
+     * request_arr : UInt8Array
+     *     Request message in the form:
+     *
+     *         [op_code: uint16][count: uint16][[address: uint32][size: uint16] * count]
+     * buffer : UInt8Array
+     *     Buffer to write region contents to (must **not** overlap with
+     *     ``request_arr``).
+     *
+     * Returns
+     * -------
+     * UInt8Array
+     *     Contents of each region, concatenated in request order.  If the
+     *     request is malformed or the regions do not fit in ``buffer``, the
+     *     returned array has a length of zero.
+     */
+    UInt8Array output = buffer;
+    output.length = 0;
+
+    if (request_arr.length < 4) { return output; }
+    uint16_t count = *reinterpret_cast<uint16_t *>(&request_arr.data[2]);
+    if (request_arr.length < 4 + count * sizeof(MemRegion)) { return output; }
+    MemRegion *regions = reinterpret_cast<MemRegion *>(&request_arr.data[4]);
+
+    uint32_t total_size = 0;
+    for (uint16_t i = 0; i < count; i++) { total_size += regions[i].size; }
+    if (total_size > buffer.length) { return output; }
+
+    for (uint16_t i = 0; i < count; i++) {
+        memcpy(&output.data[output.length],
+               reinterpret_cast<uint8_t *>(regions[i].address),
+               regions[i].size);
+        output.length += regions[i].size;
+    }
+    return output;
+}
+
+inline bool mem_write_batch(UInt8Array request_arr) {
+    /*
+     * Write contents of several memory regions.
+     *
+     * Parameters
+     * ----------
+     * request_arr : UInt8Array
+     *     Request message in the form:
+     *
+     *         [op_code: uint16][count: uint16][[address: uint32][size: uint16] * count][contents: uint8 * sum(size)]
+     *
+     *     where ``contents`` holds the new contents of each region,
+     *     concatenated in region order.
+     *
+     * Returns
+     * -------
+     * bool
+     *     ``false`` if the request is malformed (nothing is written).
+     */
+    if (request_arr.length < 4) { return false; }
+    uint16_t count = *reinterpret_cast<uint16_t *>(&request_arr.data[2]);
+    uint32_t offset = 4 + count * sizeof(MemRegion);
+    if (request_arr.length < offset) { return false; }
+    MemRegion *regions = reinterpret_cast<MemRegion *>(&request_arr.data[4]);
+
+    uint32_t total_size = 0;
+    for (uint16_t i = 0; i < count; i++) { total_size += regions[i].size; }
+    if (request_arr.length < offset + total_size) { return false; }
+
+    for (uint16_t i = 0; i < count; i++) {
+        memcpy(reinterpret_cast<uint8_t *>(regions[i].address),
+               &request_arr.data[offset], regions[i].size);
+        offset += regions[i].size;
+    }
+    return true;
+}
+
+
+#ifndef WATCH_MAX_COUNT
+#define WATCH_MAX_COUNT 16
+#endif  // #ifndef WATCH_MAX_COUNT
+
+#ifndef WATCH_SHADOW_SIZE
+#define WATCH_SHADOW_SIZE 256
+#endif  // #ifndef WATCH_SHADOW_SIZE
+
+
+struct WatchList {
+    /*
+     * Memory regions to watch for changes, along with a shadow copy of the
+     * most recently reported contents of each region.
+     */
+    uint16_t count;
+    MemRegion regions[WATCH_MAX_COUNT];
+    uint8_t shadow[WATCH_SHADOW_SIZE];
+
+    WatchList() : count(0) {}
+};
+
+
+inline UInt8Array watch(WatchList &watch_list, UInt8Array request_arr,
+                        UInt8Array buffer) {
+    /*
+     * Replace watch list.
+     *
+     * Parameters
+     * ----------
+     * watch_list : WatchList
+     *     Watch list to update.
+     * request_arr : UInt8Array
+     *     Request message in the form:
+     *
+     *         [op_code: uint16][count: uint16][[address: uint32][size: uint16] * count]
+     *
+     *     A count of zero clears the watch list.
+     * buffer : UInt8Array
+     *     Buffer to write response to.
+     *
+     * Returns
+     * -------
+     * UInt8Array
+     *     Number of regions watched, as ``uint16_t``.  If the request is
+     *     malformed or the regions do not fit in the watch list, the watch
+     *     list is cleared (i.e., the response is zero).
+     */
+    UInt8Array output = buffer;
+    output.length = sizeof(uint16_t);
+    watch_list.count = 0;
+
+    if (request_arr.length >= 4) {
+        uint16_t count = *reinterpret_cast<uint16_t *>(&request_arr.data[2]);
+        MemRegion *regions =
+            reinterpret_cast<MemRegion *>(&request_arr.data[4]);
+        uint32_t total_size = 0;
+        for (uint16_t i = 0; i < count && i < WATCH_MAX_COUNT; i++) {
+            total_size += regions[i].size;
+        }
+        if (count <= WATCH_MAX_COUNT && total_size <= WATCH_SHADOW_SIZE &&
+            request_arr.length >= 4 + count * sizeof(MemRegion)) {
+            // Start from current contents; only subsequent changes are
+            // reported.
+            uint16_t offset = 0;
+            for (uint16_t i = 0; i < count; i++) {
+                watch_list.regions[i] = regions[i];
+                memcpy(&watch_list.shadow[offset],
+                       reinterpret_cast<uint8_t *>(regions[i].address),
+                       regions[i].size);
+                offset += regions[i].size;
+            }
+            watch_list.count = count;
+        }
+    }
+    memcpy(output.data, &watch_list.count, sizeof(uint16_t));
+    return output;
+}
+
+
+inline UInt8Array watch_poll(WatchList &watch_list, UInt8Array buffer) {
+    /*
+     * Compare each watched region against its shadow copy.
+     *
+     * Call once per main loop iteration and, if the returned array is not
+     * empty, send it to the host as a ``STREAM`` packet.
+     *
+     * Parameters
+     * ----------
+     * watch_list : WatchList
+     *     Watch list.
+     * buffer : UInt8Array
+     *     Buffer to write notification to.
+     *
+     * Returns
+     * -------
+     * UInt8Array
+     *     Notification in the form:
+     *
+     *         [count: uint16][[index: uint16][contents: uint8 * size] * count]
+     *
+     *     holding the index (within the watch list) and new contents of each
+     *     changed region.  If no region changed (or the notification does
+     *     not fit in ``buffer``), the returned array has a length of zero.
+     */
+    UInt8Array output = buffer;
+    output.length = 0;
+    if (buffer.length < sizeof(uint16_t)) { return output; }
+
+    uint16_t changed = 0;
+    uint16_t length = sizeof(uint16_t);
+    uint16_t offset = 0;
+    for (uint16_t i = 0; i < watch_list.count; i++) {
+        MemRegion const &region = watch_list.regions[i];
+        uint8_t *contents = reinterpret_cast<uint8_t *>(region.address);
+        if (memcmp(&watch_list.shadow[offset], contents, region.size) != 0) {
+            if (length + sizeof(uint16_t) + region.size > buffer.length) {
+                // Report remaining changes on next call.
+                break;
+            }
+            memcpy(&watch_list.shadow[offset], contents, region.size);
+            memcpy(&output.data[length], &i, sizeof(uint16_t));
+            length += sizeof(uint16_t);
+            memcpy(&output.data[length], contents, region.size);
+            length += region.size;
+            changed++;
+        }
+        offset += region.size;
+    }
+    if (changed > 0) {
+        memcpy(output.data, &changed, sizeof(uint16_t));
+        output.length = length;
+    }
+    return output;
+}
+
+#endif  // #ifndef ___MEMORY_HEADER__H___
+'''
+
+
+def render():
+    '''
+    Returns
+    -------
+    str
+        C++ header defining firmware-side handlers for memory operations
+        (e.g., ``mem_read_batch``, ``mem_write_batch``, ``watch``).
+    '''
+    return jinja2.Template(template).render()
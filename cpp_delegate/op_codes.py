@@ -0,0 +1,82 @@
+from collections import OrderedDict
+import hashlib
+
+import jinja2
+import numpy as np
+
+__all__ = ['OPERATIONS', 'OP_ADDRESS_OF', 'OP_ADDRESS_TABLE', 'OP_CALL',
+           'OP_CALL_BATCH', 'OP_CODES', 'OP_FIRMWARE_ID', 'OP_MEM_READ',
+           'OP_MEM_READ_BATCH', 'OP_MEM_WRITE', 'OP_MEM_WRITE_BATCH',
+           'OP_WATCH', 'operation_code', 'render']
+
+
+def operation_code(name):
+    '''
+    Parameters
+    ----------
+    name : str
+        Operation name.
+
+    Returns
+    -------
+    int
+        ``uint16`` operation code derived from SHA-256 hash of name.
+
+    Notes
+    -----
+    Codes for known operations are precomputed in :data:`OP_CODES`; use those
+    instead of calling this function on every request.
+    '''
+    return np.fromstring(hashlib.sha256(name).digest(),
+                         dtype='uint8').view('uint16')[0]
+
+
+#: Name of each operation supported by remote context protocol.
+OPERATIONS = ('address_of', 'address_table', 'firmware_id', 'mem_read',
+              'mem_read_batch', 'mem_write', 'watch', 'mem_write_batch',
+              'call', 'call_batch')
+
+#: Operation code of each operation, keyed by operation name.
+OP_CODES = OrderedDict([(name_i, int(operation_code(name_i)))
+                        for name_i in OPERATIONS])
+
+if len(set(OP_CODES.values())) != len(OP_CODES):
+    raise ValueError('Operation codes are not unique: {}'.format(OP_CODES))
+
+OP_ADDRESS_OF = OP_CODES['address_of']
+OP_ADDRESS_TABLE = OP_CODES['address_table']
+OP_CALL = OP_CODES['call']
+OP_CALL_BATCH = OP_CODES['call_batch']
+OP_FIRMWARE_ID = OP_CODES['firmware_id']
+OP_MEM_READ = OP_CODES['mem_read']
+OP_MEM_READ_BATCH = OP_CODES['mem_read_batch']
+OP_MEM_WRITE = OP_CODES['mem_write']
+OP_MEM_WRITE_BATCH = OP_CODES['mem_write_batch']
+OP_WATCH = OP_CODES['watch']
+
+
+template = '''
+#ifndef ___OP_CODES__H___
+#define ___OP_CODES__H___
+
+#include <stdint.h>
+
+// Map each remote context operation to its code, i.e.,
+// `sha256(<name>).digest()[:2]` as little-endian `uint16_t`.
+{%- for name_i, code_i in op_codes.items() %}
+const uint16_t OP__{{ name_i.upper() }} = {{ '0x%04x'|format(code_i) }};
+{%- endfor %}
+
+#endif  // #ifndef ___OP_CODES__H___
+'''
+
+
+def render():
+    '''
+    Returns
+    -------
+    str
+        C++ header defining an ``OP__<NAME>`` constant for each operation
+        code in :data:`OP_CODES`, so host and firmware share the same codes.
+    '''
+    return jinja2.Template(template).render(op_codes=OP_CODES)
@@ -0,0 +1,254 @@
+from collections import namedtuple
+import struct
+import time
+
+import nadamq as nq
+import nadamq.NadaMq
+import numpy as np
+
+__all__ = ['Packet', 'PacketDecoder', 'PacketReader', 'PacketWriter',
+           'encode_packet']
+
+
+START_FLAG = b'|||'
+# Packet header following start flag: `[iuid: uint16][type: uint8]`, followed
+# by `[length: uint16]` for packets carrying a payload.  All multi-byte fields
+# are serialized in network byte order (see `write_packet` in NadaMq
+# `PacketWriter.h`).
+HEADER = struct.Struct('>HB')
+LENGTH = struct.Struct('>H')
+CRC = struct.Struct('>H')
+PAYLOAD_OFFSET = len(START_FLAG) + HEADER.size + LENGTH.size
+PAYLOAD_TYPES = (nq.NadaMq.PACKET_TYPES.DATA, nq.NadaMq.PACKET_TYPES.STREAM)
+
+#: Decoded packet; :attr:`data` holds the payload as a byte string.
+Packet = namedtuple('Packet', ['iuid', 'type_', 'data'])
+
+
+def compute_crc(data):
+    '''
+    Parameters
+    ----------
+    data : bytearray or numpy.ndarray
+        Packet payload (must be writable, e.g., a :class:`bytearray`).
+
+    Returns
+    -------
+    int
+        NadaMq CRC checksum of payload.
+    '''
+    crc = nq.NadaMq.crc_init()
+    if len(data):
+        crc = nq.NadaMq.crc_update(crc, data)
+    return nq.NadaMq.crc_finalize(crc)
+
+
+def encode_packet(data, iuid=0, type_=nq.NadaMq.PACKET_TYPES.DATA):
+    '''
+    Parameters
+    ----------
+    data : str
+        Packet payload.
+    iuid : int, optional
+        Packet identifier.
+    type_ : int, optional
+        Packet type (must be a type carrying a payload, i.e., ``DATA`` or
+        ``STREAM``).
+
+    Returns
+    -------
+    bytearray
+        Serialized NadaMq packet.
+
+    See also
+    --------
+    :class:`PacketWriter`
+    '''
+    packet = bytearray(PAYLOAD_OFFSET + len(data) + CRC.size)
+    packet[:len(START_FLAG)] = START_FLAG
+    HEADER.pack_into(packet, len(START_FLAG), iuid, type_)
+    LENGTH.pack_into(packet, len(START_FLAG) + HEADER.size, len(data))
+    packet[PAYLOAD_OFFSET:PAYLOAD_OFFSET + len(data)] = data
+    CRC.pack_into(packet, PAYLOAD_OFFSET + len(data),
+                  compute_crc(packet[PAYLOAD_OFFSET:PAYLOAD_OFFSET +
+                                     len(data)]))
+    return packet
+
+
+class PacketDecoder(object):
+    '''
+    Incrementally decode NadaMq packets from bytes as they arrive.
+
+    Bytes are buffered until a complete packet is available, so packets split
+    across several reads (e.g., across USB frames) are reassembled.  Any
+    bytes following a complete packet are kept for the next call to
+    :meth:`pop_packet`.
+    '''
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        '''
+        Parameters
+        ----------
+        data : str
+            Bytes received from stream.
+        '''
+        self._buffer.extend(data)
+
+    def pop_packet(self):
+        '''
+        Returns
+        -------
+        Packet or None
+            Next complete packet in buffer, or ``None`` if buffer does not
+            contain a complete packet.
+
+        Raises
+        ------
+        IOError
+            If a complete packet was received with an invalid CRC checksum.
+            The corrupt packet is discarded.
+        '''
+        # Discard any bytes preceding the start of a packet.
+        start = self._buffer.find(START_FLAG)
+        if start < 0:
+            # Keep trailing bytes that may be the start of a partial flag.
+            del self._buffer[:max(0, len(self._buffer) -
+                                  len(START_FLAG) + 1)]
+            return None
+        elif start > 0:
+            del self._buffer[:start]
+
+        offset = len(START_FLAG)
+        if len(self._buffer) < offset + HEADER.size:
+            return None
+        iuid, type_ = HEADER.unpack_from(self._buffer, offset)
+        offset += HEADER.size
+
+        if type_ not in PAYLOAD_TYPES:
+            del self._buffer[:offset]
+            return Packet(iuid, type_, b'')
+
+        if len(self._buffer) < offset + LENGTH.size:
+            return None
+        length, = LENGTH.unpack_from(self._buffer, offset)
+        offset += LENGTH.size
+        if len(self._buffer) < offset + length + CRC.size:
+            return None
+        payload = self._buffer[offset:offset + length]
+        offset += length
+        crc, = CRC.unpack_from(self._buffer, offset)
+        offset += CRC.size
+        del self._buffer[:offset]
+
+        if crc != compute_crc(payload):
+            raise IOError('CRC mismatch in packet (iuid={}).'.format(iuid))
+        return Packet(iuid, type_, bytes(payload))
+
+
+class PacketReader(PacketDecoder):
+    '''
+    Incrementally decode NadaMq packets from a stream, blocking until a
+    complete packet is available.
+
+    Parameters
+    ----------
+    stream : serial.Serial
+        A serial connection (or any object providing ``in_waiting`` and
+        ``read(size)``).
+    timeout : float, optional
+        Maximum number of seconds to wait for a complete packet.
+
+        A value of ``None`` waits indefinitely.
+    poll_interval : float, optional
+        Number of seconds to sleep between polls of the stream while no bytes
+        are available.
+    '''
+    def __init__(self, stream, timeout=1., poll_interval=.001):
+        super(PacketReader, self).__init__()
+        self.stream = stream
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    def read_packet(self):
+        '''
+        Block until a complete packet has been received.
+
+        Returns
+        -------
+        Packet
+            Next packet received from stream.
+
+        Raises
+        ------
+        IOError
+            If no complete packet was received within :attr:`timeout` seconds,
+            or if a packet with an invalid CRC checksum was received.
+        '''
+        start = time.time()
+        while True:
+            packet = self.pop_packet()
+            if packet is not None:
+                return packet
+            bytes_waiting = self.stream.in_waiting
+            if bytes_waiting:
+                self.feed(self.stream.read(bytes_waiting))
+                continue
+            if (self.timeout is not None and time.time() - start >
+                    self.timeout):
+                raise IOError('Timed out waiting for packet (timeout={}s).'
+                              .format(self.timeout))
+            time.sleep(self.poll_interval)
+
+
+class PacketWriter(object):
+    '''
+    Write NadaMq data packets to a stream from a preallocated buffer.
+
+    Request payloads are written in place to :attr:`payload` (e.g., using
+    :meth:`struct.Struct.pack_into`) and framed by :meth:`write`, which hands
+    the packet to the stream as a :class:`memoryview` of the buffer, i.e.,
+    without copying the payload.
+
+    Parameters
+    ----------
+    stream : serial.Serial
+        A serial connection (or any object providing ``write(data)``).
+
+        The stream must consume the data before ``write`` returns, since the
+        buffer is reused for the next packet.
+    buffer_size : int, optional
+        Maximum payload length, in bytes.
+
+    Attributes
+    ----------
+    payload : numpy.ndarray
+        Writable ``uint8`` view of payload section of packet buffer.
+    '''
+    def __init__(self, stream, buffer_size=(1 << 16) - 1):
+        self.stream = stream
+        self._buffer = bytearray(PAYLOAD_OFFSET + buffer_size + CRC.size)
+        self._buffer[:len(START_FLAG)] = START_FLAG
+        self._view = memoryview(self._buffer)
+        self.payload = np.frombuffer(self._buffer, dtype='uint8',
+                                     count=buffer_size, offset=PAYLOAD_OFFSET)
+
+    def write(self, length, iuid=0):
+        '''
+        Frame first :data:`length` bytes of :attr:`payload` as a data packet
+        and write packet to stream.
+
+        Parameters
+        ----------
+        length : int
+            Payload length, in bytes.
+        iuid : int, optional
+            Packet identifier.
+        '''
+        HEADER.pack_into(self._buffer, len(START_FLAG), iuid,
+                         nq.NadaMq.PACKET_TYPES.DATA)
+        LENGTH.pack_into(self._buffer, len(START_FLAG) + HEADER.size, length)
+        CRC.pack_into(self._buffer, PAYLOAD_OFFSET + length,
+                      compute_crc(self.payload[:length]))
+        self.stream.write(self._view[:PAYLOAD_OFFSET + length + CRC.size])
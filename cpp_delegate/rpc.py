@@ -0,0 +1,150 @@
+import struct
+
+import numpy as np
+
+__all__ = ['RemoteFunction', 'get_struct_format']
+
+
+# Command index, followed by packed arguments (see `RemoteFunction.pack_into`).
+CALL_COMMAND = struct.Struct('<H')  # [command]
+
+# `struct` format character of each supported scalar type.
+STRUCT_FORMATS = {'bool': '?', 'int8': 'b', 'uint8': 'B', 'int16': 'h',
+                  'uint16': 'H', 'int32': 'i', 'uint32': 'I', 'int64': 'q',
+                  'uint64': 'Q', 'float32': 'f', 'float64': 'd'}
+
+
+def get_struct_format(dtypes):
+    '''
+    Parameters
+    ----------
+    dtypes : list
+        List of scalar :class:`numpy.dtype` objects.
+
+    Returns
+    -------
+    str
+        :mod:`struct` format matching a ``__attribute__((packed))`` C
+        ``struct`` with one field of each type (little-endian), or ``None`` if
+        any type is not a scalar type.
+    '''
+    try:
+        return '<' + ''.join([STRUCT_FORMATS[dtype_i.name]
+                              for dtype_i in dtypes])
+    except KeyError:
+        return None
+
+
+class RemoteFunction(object):
+    '''
+    Proxy for a free function exposed by the firmware command switch (see
+    :func:`cpp_delegate.member_header.render`).
+
+    Request and response layouts are compiled once, so each call packs the
+    arguments directly into the request buffer of the remote context and
+    sends a single packet (see
+    :meth:`cpp_delegate.context.RemoteContext.call_batch` to send several
+    calls in a single packet).
+
+    Parameters
+    ----------
+    context : cpp_delegate.context.RemoteContext
+        Remote context used to send requests.
+    name : str
+        Function name.
+    command : int
+        Command index (i.e., ``CMD__<name>``).
+    arg_names : list
+        Name of each argument.
+    arg_dtypes : list
+        Scalar type of each argument.
+    result_dtype : numpy.dtype
+        Scalar type of result.
+    '''
+    def __init__(self, context, name, command, arg_names, arg_dtypes,
+                 result_dtype):
+        self.context = context
+        self.__name__ = name
+        self.command = command
+        self.arg_names = list(arg_names)
+        self.request = struct.Struct(get_struct_format(arg_dtypes))
+        self.result_dtype = result_dtype
+        self.__doc__ = '{}({}) -> {}'.format(name, ', '.join(
+            ['{} {}'.format(dtype_i.name, name_i)
+             for name_i, dtype_i in zip(arg_names, arg_dtypes)]),
+            result_dtype.name)
+
+    def __repr__(self):
+        return '<RemoteFunction {}>'.format(self.__doc__)
+
+    def get_args(self, args, kwargs):
+        '''
+        Returns
+        -------
+        tuple
+            Positional and keyword arguments, in declaration order.
+
+        Raises
+        ------
+        TypeError
+            If arguments do not match function signature.
+        '''
+        if not kwargs and len(args) == len(self.arg_names):
+            return args
+        args = list(args)
+        for name_i in self.arg_names[len(args):]:
+            if name_i not in kwargs:
+                raise TypeError('{} missing argument: {}'
+                                .format(self.__doc__, name_i))
+            args.append(kwargs.pop(name_i))
+        if kwargs or len(args) != len(self.arg_names):
+            raise TypeError('{} takes {} arguments'
+                            .format(self.__doc__, len(self.arg_names)))
+        return tuple(args)
+
+    def pack_into(self, buffer_, offset, args):
+        '''
+        Pack command index and arguments, i.e., ``[command][arguments]``.
+
+        Returns
+        -------
+        int
+            Offset of first byte after request.
+        '''
+        CALL_COMMAND.pack_into(buffer_, offset, self.command)
+        offset += CALL_COMMAND.size
+        self.request.pack_into(buffer_, offset, *args)
+        return offset + self.request.size
+
+    @property
+    def size(self):
+        '''
+        Size of ``[command][arguments]`` request, in bytes.
+        '''
+        return CALL_COMMAND.size + self.request.size
+
+    def decode(self, data):
+        '''
+        Parameters
+        ----------
+        data : str
+            Response payload.
+
+        Returns
+        -------
+        numpy scalar
+            Result decoded from response.
+
+        Raises
+        ------
+        IOError
+            If response does not have the size of the result type.
+        '''
+        if len(data) != self.result_dtype.itemsize:
+            raise IOError('Expected {} bytes in response to {}, received {}.'
+                          .format(self.result_dtype.itemsize, self.__name__,
+                                  len(data)))
+        return np.frombuffer(data, dtype=self.result_dtype, count=1)[0]
+
+    def __call__(self, *args, **kwargs):
+        return self.context._call(self, self.get_args(args, kwargs))
@@ -0,0 +1,205 @@
+import threading
+import time
+
+import numpy as np
+
+from .context import MEM_READ_BATCH_HEADER, MEM_REGION_DTYPE
+from .op_codes import OP_MEM_READ_BATCH
+from .packet_stream import encode_packet
+
+__all__ = ['Sampler']
+
+
+class Sampler(object):
+    '''
+    Periodically sample attributes of a remote context in a background
+    thread.
+
+    The batched read request is framed once, up front; each sample costs a
+    single request/response round trip.  Response payloads are copied
+    directly into a preallocated ring buffer, whose structured type matches
+    the response layout (after a ``timestamp`` column), so no per-sample
+    decoding is required.
+
+    While the sampler is running, it owns the stream of the remote context;
+    the context must not be used from other threads.
+
+    Parameters
+    ----------
+    context : cpp_delegate.context.RemoteContext
+        Remote context to sample.
+    attrs : list
+        Names of attributes to sample.
+
+        Combined size of attributes must fit in a single chunk (i.e.,
+        ``context.chunk_size``).
+    rate : float
+        Target sample rate, in samples per second.
+    capacity : int, optional
+        Number of samples kept in ring buffer.  Once the buffer is full, the
+        oldest samples are overwritten.
+
+    Attributes
+    ----------
+    count : int
+        Number of samples acquired since :meth:`start`.
+    dropped : int
+        Number of sample periods missed since :meth:`start` (e.g., because a
+        round trip took longer than one period).
+    error : Exception or None
+        Exception that stopped the sampling thread, if any.
+
+    Examples
+    --------
+    >>> with Sampler(ctx, ['temperature', 'pressure'], rate=100) as sampler:
+    ...     time.sleep(10)
+    >>> samples = sampler.samples()
+    >>> samples['timestamp'], samples['temperature']
+    '''
+    def __init__(self, context, attrs, rate, capacity=10000):
+        self.context = context
+        self.attrs = list(attrs)
+        self.period = 1. / rate
+        self.capacity = capacity
+
+        fields = []
+        for attr_i in self.attrs:
+            dtype_i = context._dtypes[attr_i]
+            if dtype_i is None:
+                raise TypeError('Type not understood: {}'
+                                .format(context._attributes[attr_i]['type']))
+            fields.append((str(attr_i), dtype_i))
+        #: Structured type of each sample (packed, in order of `attrs`).
+        self.dtype = np.dtype([('timestamp', 'float64')] + fields)
+        self._response_size = self.dtype.itemsize - 8
+        if self._response_size > context.chunk_size:
+            raise ValueError('Attributes do not fit in a single chunk: {} > '
+                             '{} bytes'.format(self._response_size,
+                                               context.chunk_size))
+
+        if len([attr_i for attr_i in self.attrs
+                if attr_i not in context._addresses]) > 1:
+            context.prime_addresses()
+        regions = np.array([(context._address(attr_i), dtype_i.itemsize)
+                            for attr_i, dtype_i in fields],
+                           dtype=MEM_REGION_DTYPE)
+        self._request = bytes(encode_packet(MEM_READ_BATCH_HEADER
+                                            .pack(OP_MEM_READ_BATCH,
+                                                  regions.size) +
+                                            regions.tobytes()))
+
+        self._buffer = np.zeros(capacity, dtype=self.dtype)
+        # Raw bytes of each row, for copying responses in place.
+        self._rows = self._buffer.view('uint8').reshape(capacity,
+                                                          self.dtype.itemsize)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _reset(self):
+        self.count = 0
+        self.dropped = 0
+        self.error = None
+        self._start_time = None
+        self._end_time = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def rate(self):
+        '''
+        Achieved sample rate, in samples per second.
+        '''
+        if self._start_time is None:
+            return 0.
+        end_time = (self._end_time if self._end_time is not None
+                    else time.time())
+        return self.count / max(end_time - self._start_time, 1e-9)
+
+    def start(self):
+        '''
+        Start sampling in a background thread.
+
+        Previously acquired samples are discarded.
+        '''
+        if self.running:
+            raise RuntimeError('Sampler is already running.')
+        self._reset()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='Sampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        '''
+        Stop sampling and wait for the background thread to exit.
+
+        Raises
+        ------
+        Exception
+            Exception raised in the sampling thread, if any.
+        '''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        stream = self.context.stream
+        self._start_time = next_time = time.time()
+        try:
+            while not self._stop.is_set():
+                timestamp = time.time()
+                stream.write(self._request)
+                # Request is framed with iuid 0, which is never used by other
+                # requests of the context.
+                data = self.context._read_response(0).data
+                if len(data) != self._response_size:
+                    raise IOError('Expected {} bytes in response, received '
+                                  '{}.'.format(self._response_size,
+                                               len(data)))
+                with self._lock:
+                    i = self.count % self.capacity
+                    self._buffer['timestamp'][i] = timestamp
+                    self._rows[i, 8:] = np.frombuffer(data, dtype='uint8')
+                    self.count += 1
+
+                next_time += self.period
+                now = time.time()
+                if now > next_time:
+                    # Skip periods that have already passed.
+                    missed = int((now - next_time) // self.period)
+                    self.dropped += missed
+                    next_time += missed * self.period
+                else:
+                    self._stop.wait(next_time - now)
+        except Exception as exception:
+            self.error = exception
+        finally:
+            self._end_time = time.time()
+
+    def samples(self):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Copy of samples in ring buffer, oldest first (at most
+            :attr:`capacity` samples).
+        '''
+        with self._lock:
+            if self.count <= self.capacity:
+                return self._buffer[:self.count].copy()
+            start = self.count % self.capacity
+            return np.concatenate([self._buffer[start:],
+                                   self._buffer[:start]])
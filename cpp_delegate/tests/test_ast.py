@@ -0,0 +1,144 @@
+'''
+Round-trip C++ abstract syntax trees through :mod:`cpp_delegate.ast_file`
+and :mod:`cpp_delegate.ast_cache`.
+'''
+import json
+
+import pytest
+
+from cpp_delegate import ast_file, merge_cpp_asts
+from cpp_delegate.ast_cache import AstCache, find_headers
+from cpp_delegate.ast_file import LazyNode
+
+
+CPP_AST_JSON = {'kind': 'TRANSLATION_UNIT', 'name': 'main.cpp',
+                'members': {'count': {'kind': 'VAR_DECL', 'name': 'count',
+                                      'type': 'uint32_t'}},
+                'typedefs': {},
+                'namespaces': {'foo': {'members': {},
+                                       'namespaces': {'bar': {}}},
+                               'empty': {'namespaces': {}}}}
+
+
+@pytest.fixture
+def ast_path(tmpdir):
+    path = str(tmpdir.join('cpp_ast.bin'))
+    ast_file.dump(CPP_AST_JSON, path)
+    return path
+
+
+def test_round_trip(ast_path):
+    cpp_ast = ast_file.load(ast_path)
+    assert isinstance(cpp_ast, LazyNode)
+    # Empty collections and namespaces are kept.
+    assert cpp_ast.to_dict() == CPP_AST_JSON
+    assert json.loads(json.dumps(cpp_ast.to_dict())) == CPP_AST_JSON
+
+
+def test_lazy_access(ast_path):
+    cpp_ast = ast_file.load(ast_path)
+    assert sorted(cpp_ast) == sorted(CPP_AST_JSON)
+    assert cpp_ast['members'] == CPP_AST_JSON['members']
+    # Every access path decodes values.
+    assert dict(cpp_ast)['typedefs'] == {}
+    assert cpp_ast.copy()['members'] == CPP_AST_JSON['members']
+    assert (dict(**cpp_ast['namespaces']['foo'])['members'] ==
+            CPP_AST_JSON['namespaces']['foo']['members'])
+
+
+def test_changed_file(ast_path):
+    cpp_ast = ast_file.load(ast_path)
+    ast_file.dump(dict(CPP_AST_JSON, typedefs={'gain_t': {'type': 'float'}}),
+                  ast_path)
+    with pytest.raises(IOError):
+        cpp_ast['members']
+
+
+def test_load_json(tmpdir):
+    path = tmpdir.join('cpp_ast.json')
+    path.write(json.dumps(CPP_AST_JSON))
+    assert ast_file.load(str(path)) == CPP_AST_JSON
+
+
+@pytest.fixture
+def project(tmpdir):
+    tmpdir.join('src', 'main.cpp').write('#include "config.h"\n'
+                                         '#include <lib.h>\n'
+                                         '#include <Arduino.h>\n',
+                                         ensure=True)
+    tmpdir.join('src', 'config.h').write('#define GAIN 2\n')
+    tmpdir.join('lib', 'lib.h').write('#ifdef GAIN\n#include "util.h"\n'
+                                      '#endif\n', ensure=True)
+    tmpdir.join('lib', 'util.h').write('')
+    return tmpdir
+
+
+def test_find_headers(project):
+    headers = find_headers(str(project.join('src', 'main.cpp')),
+                           [str(project.join('lib'))])
+    # Headers are found transitively (regardless of `#ifdef`); headers not
+    # found in include directories (e.g., `Arduino.h`) are ignored.
+    project = project.realpath()
+    assert headers == sorted([str(project.join('src', 'config.h')),
+                              str(project.join('lib', 'lib.h')),
+                              str(project.join('lib', 'util.h'))])
+
+
+def test_cache_key(project):
+    source = str(project.join('src', 'main.cpp'))
+    flags = ['-DFOO', '-I{}'.format(project.join('lib'))]
+    cache = AstCache(str(project.join('.cpp_ast_cache')),
+                     parser_version='1.0')
+    key = cache.key(source, flags)
+    assert cache.key(source, flags) == key
+    assert cache.key(source, flags[1:]) != key
+    assert AstCache(cache.cache_dir, parser_version='2.0').key(source,
+                                                                flags) != key
+    # Any transitively included header changes key.
+    project.join('lib', 'util.h').write('int x;\n')
+    assert cache.key(source, flags) != key
+
+
+def test_cache_round_trip(project):
+    source = str(project.join('src', 'main.cpp'))
+    cache = AstCache(str(project.join('.cpp_ast_cache')),
+                     parser_version='1.0')
+    assert cache.get(source, 'a') is None
+    cache.set(source, 'a', CPP_AST_JSON)
+    assert cache.get(source, 'a') == CPP_AST_JSON
+    # Writing an entry replaces previous entry for same source file.
+    cache.set(source, 'b', {})
+    assert cache.get(source, 'a') is None
+    assert cache.get(source, 'b') == {}
+    assert len(cache.cache_dir.files()) == 1
+
+
+def test_merge_cpp_asts():
+    def variable(name, file_):
+        return {'kind': 'VAR_DECL', 'name': name, 'type': 'int',
+                'location': {'file': file_}}
+
+    main = {'members': {'a': variable('a', 'main.cpp'),
+                        'shared': variable('shared', 'shared.h')},
+            'namespaces': {'foo': {'members': {'x': variable('x',
+                                                             'main.cpp')}}}}
+    other = {'members': {'b': variable('b', 'other.cpp'),
+                         'shared': variable('shared', 'other.cpp')},
+             'namespaces': {'foo': {'members': {'y': variable('y',
+                                                              'other.cpp')}},
+                            'bar': {}}}
+    merged = merge_cpp_asts([main, other])
+    assert sorted(merged['members']) == ['a', 'b', 'shared']
+    # Definition (i.e., in a source file) takes precedence over header.
+    assert merged['members']['shared']['location']['file'] == 'other.cpp'
+    # Namespaces are merged recursively.
+    assert sorted(merged['namespaces']) == ['bar', 'foo']
+    assert sorted(merged['namespaces']['foo']['members']) == ['x', 'y']
+    # Inputs are not modified.
+    assert sorted(main['namespaces']['foo']['members']) == ['x']
+
+    # Otherwise, node from first translation unit is kept.
+    other['members']['a'] = variable('a', 'other.cpp')
+    assert (merge_cpp_asts([main, other])['members']['a']['location']
+            ['file'] == 'main.cpp')
+    assert merge_cpp_asts([main]) == main
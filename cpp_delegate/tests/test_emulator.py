@@ -0,0 +1,230 @@
+'''
+Round-trip :class:`cpp_delegate.context.RemoteContext` requests through
+:class:`cpp_delegate.emulator.DeviceEmulator`.
+'''
+import numpy as np
+import pytest
+
+from cpp_delegate.context import RemoteContext
+from cpp_delegate.emulator import DeviceEmulator
+
+
+def variable(name, type_, const=False, kind='VAR_DECL'):
+    return {'kind': kind, 'name': name, 'type': type_,
+            'underlying_type': type_, 'const': const, 'volatile': False,
+            'location': {'file': 'main.cpp',
+                         'start': {'line': 1, 'column': 1}}}
+
+
+def function(name, result_type, arguments):
+    return {'kind': 'FUNCTION_DECL', 'name': name,
+            'result_type': result_type,
+            'arguments': [{'name': name_i, 'type': type_i, 'kind': 'X'}
+                          for name_i, type_i in arguments]}
+
+
+CPP_AST_JSON = {'members': {
+    'count': variable('count', 'uint32_t'),
+    'gain': variable('gain', 'float'),
+    'offset': variable('offset', 'int16_t'),
+    'version': variable('version', 'uint8_t', const=True),
+    'samples': variable('samples', 'uint16_t [2][300]',
+                        kind='CONSTANTARRAY'),
+    'add': function('add', 'float', [('x', 'float'), ('y', 'int16_t')]),
+    'scale': function('scale', 'int32_t', [('x', 'int32_t')])}}
+
+
+@pytest.fixture
+def device():
+    return DeviceEmulator(CPP_AST_JSON,
+                          functions={'add': lambda x, y: x + y,
+                                     'scale': lambda x: 3 * x})
+
+
+@pytest.fixture
+def ctx(device):
+    # Small chunks, so large attributes span several requests.
+    return RemoteContext(device, CPP_AST_JSON, chunk_size=256)
+
+
+def test_getattr_setattr(device, ctx):
+    ctx.count = 123456
+    ctx.gain = 2.5
+    ctx.offset = -7
+    assert device.get('count') == 123456
+    assert device.get('gain') == 2.5
+    assert ctx.offset == -7
+
+    device.set('version', 3)
+    assert ctx.version == 3
+    with pytest.raises(AttributeError):
+        ctx.version = 4
+
+
+def test_array(device, ctx):
+    samples = np.arange(600, dtype='uint16').reshape(2, 300)
+    ctx.samples = samples
+    np.testing.assert_array_equal(device.get('samples'), samples)
+    np.testing.assert_array_equal(ctx.samples, samples)
+
+
+def test_snapshot(device, ctx):
+    device.set('count', 5)
+    device.set('gain', -1.5)
+    device.set('samples', np.ones((2, 300)))
+    values = ctx._read_attributes()
+    assert sorted(values) == ['count', 'gain', 'offset', 'samples',
+                              'version']
+    assert values['count'] == 5
+    assert values['gain'] == -1.5
+    assert values['samples'].sum() == 600
+
+
+def test_batch(device, ctx):
+    ctx.prime_addresses()
+    rx_packets = device.stats['rx_packets']
+    with ctx.batch(verify=True):
+        ctx.count = 1
+        ctx.gain = 2
+        ctx.offset = 3
+        # Writes are buffered until the end of the block.
+        assert device.stats['rx_packets'] == rx_packets
+    assert (device.get('count'), device.get('gain'),
+            device.get('offset')) == (1, 2, 3)
+
+
+def test_batch_aborted(device, ctx):
+    with pytest.raises(RuntimeError):
+        with ctx.batch():
+            ctx.count = 1
+            raise RuntimeError()
+    assert device.get('count') == 0
+
+
+def test_cache_copies():
+    x, y = variable('x', 'int32_t'), variable('y', 'int32_t')
+    y['location'] = {'file': 'main.cpp', 'start': {'line': 2, 'column': 1}}
+    cpp_ast_json = {'members': dict(CPP_AST_JSON['members'],
+                                    point=variable('point', 'Point')),
+                    'classes': {'Point': {'kind': 'STRUCT_DECL',
+                                          'members': {'x': x, 'y': y}}}}
+    device = DeviceEmulator(cpp_ast_json)
+    device.set('point', (1, 2))
+    ctx = RemoteContext(device, cpp_ast_json, cache_ttl=60.)
+    # Values returned on cache miss, on cache hit, and by snapshot must not
+    # share memory with cached values.
+    for i in range(2):
+        samples = ctx.samples
+        samples[:] = 7
+        point = ctx.point
+        point['x'] = 7
+    values = ctx._read_attributes()
+    values['samples'][:] = 7
+    values['point']['x'] = 7
+    assert ctx.samples.sum() == 0
+    assert tuple(ctx.point) == (1, 2)
+    assert ctx.cache_stats['hits'] == 4
+
+
+def test_watch(device, ctx):
+    changes = []
+    ctx.watch(['count', 'gain'], lambda attr, value:
+              changes.append((attr, value)))
+    device.set('count', 11)
+    ctx.poll_notifications()
+    assert changes == [('count', 11)]
+
+    ctx.unwatch()
+    device.set('count', 12)
+    ctx.poll_notifications()
+    assert changes == [('count', 11)]
+
+
+def test_watch_callback_error(device, ctx):
+    changes = []
+
+    def callback(attr, value):
+        changes.append((attr, value))
+        raise RuntimeError('Callback failed.')
+    ctx.watch(['count'], callback)
+    device.set('count', 11)
+    device.set('offset', 3)
+    # Notification is dispatched while waiting for responses; failing
+    # callback must not abort (or desynchronize) requests.
+    assert [ctx.offset for i in range(3)] == [3, 3, 3]
+    assert changes == [('count', 11)]
+
+
+def test_call(ctx):
+    assert ctx.add(1.5, 2) == 3.5
+    assert ctx.scale(x=-4) == -12
+    with pytest.raises(TypeError):
+        ctx.add(1)
+
+
+def test_call_batch(ctx):
+    results = ctx.call_batch([('add', (1, 1)), ('scale', (4, ))] * 50)
+    assert list(results) == [2, 12] * 50
+
+
+def test_stale_response(device):
+    ctx = RemoteContext(device, CPP_AST_JSON)
+    ctx.prime_addresses()
+    device.set('count', 1)
+    device.set('offset', 2)
+    device.latency = .05
+    ctx.timeout = .01
+    with pytest.raises(IOError):
+        ctx.count
+    # Late response to timed out request must not be read as response to
+    # the next request.
+    ctx.timeout = 1.
+    assert ctx.offset == 2
+
+
+def test_shadowed_attributes():
+    cpp_ast_json = {'members': dict(CPP_AST_JSON['members'],
+                                    timeout=variable('timeout', 'uint32_t'),
+                                    window=variable('window', 'uint32_t'))}
+    device = DeviceEmulator(cpp_ast_json)
+    ctx = RemoteContext(device, cpp_ast_json)
+    # Host-side settings shadow remote variables, for reads and writes.
+    ctx.timeout = 5.
+    ctx.window = 2
+    assert (ctx.timeout, ctx._reader.timeout, ctx.window) == (5., 5., 2)
+    assert (device.get('timeout'), device.get('window')) == (0, 0)
+    ctx._write_attribute('timeout', 7)
+    assert ctx._read_attribute('timeout') == 7
+
+
+def test_address_table_pages(device):
+    # Two address table entries per request.
+    ctx = RemoteContext(device, CPP_AST_JSON, chunk_size=16)
+    rx_packets = device.stats['rx_packets']
+    ctx.prime_addresses()
+    assert (device.stats['rx_packets'] - rx_packets ==
+            (len(ctx._member_ids) + 1) // 2)
+    assert ctx._addresses == device.addresses
+
+    # Address table page does not fit in device buffer.
+    device.buffer_size = 8
+    ctx = RemoteContext(device, CPP_AST_JSON, chunk_size=16)
+    with pytest.raises(IOError) as exception:
+        ctx.prime_addresses()
+    assert 'too large for the device buffer' in str(exception.value)
+
+
+def test_ast_mismatch(device):
+    # `gain257998` has the same member ID as `gain` (i.e., the device
+    # firmware was generated from a different abstract syntax tree).
+    members = dict(CPP_AST_JSON['members'])
+    members['gain257998'] = variable('gain257998', 'float')
+    del members['gain']
+    cpp_ast_json = {'members': members}
+    ctx = RemoteContext(device, cpp_ast_json)
+    assert ctx._member_ids['gain257998'] == device._member_ids['gain']
+    with pytest.raises(IOError) as exception:
+        ctx.prime_addresses()
+    assert 'name hash differs' in str(exception.value)
+    with pytest.raises(IOError):
+        ctx.gain257998
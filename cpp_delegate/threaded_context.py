@@ -0,0 +1,265 @@
+'''
+Thread-safe access to remote contexts through a single I/O worker thread.
+
+Requires :mod:`concurrent.futures` (Python 3.2+) or the `futures`_ backport
+(Python 2.7).
+
+.. _futures: https://pypi.org/project/futures/
+'''
+import threading
+
+from concurrent.futures import Future
+from six.moves import queue
+
+from .context import RemoteContext
+
+__all__ = ['ThreadedRemoteContext']
+
+
+class ThreadedRemoteContext(RemoteContext):
+    '''
+    Remote context that may be shared between threads.
+
+    A dedicated I/O worker thread owns :attr:`stream`; every request is
+    submitted to a queue and executed by the worker in submission order, so
+    requests and responses from different threads never interleave.
+
+    Attribute access (e.g., ``ctx.foo``, ``ctx.foo = 1``) blocks until the
+    worker has completed the request, as with :class:`RemoteContext`.  The
+    :meth:`read_attribute`, :meth:`write_attribute` and
+    :meth:`read_attributes` methods return :class:`concurrent.futures.Future`
+    objects instead.
+
+    Reads of the same attribute (or memory region) submitted while an
+    identical read is still queued share a single transfer (and future).
+    Reads are never shared across a write, so each read reflects every write
+    submitted before it.
+
+    Within a :meth:`RemoteContext.batch` block, only writes from the thread
+    that entered the block are buffered; other threads keep writing
+    immediately, so an aborted batch never discards their writes.
+
+    Watch notifications (see :meth:`RemoteContext.watch`) are dispatched by
+    the worker thread, so callbacks are called from the worker thread.
+
+    Accepts the same parameters as :class:`RemoteContext`.  Call
+    :meth:`close` to stop the worker thread.
+    '''
+    def __init__(self, *args, **kwargs):
+        self._queue = queue.Queue()
+        # Futures of queued reads, keyed by request (see `_submit`).
+        self._pending_reads = {}
+        self._pending_lock = threading.Lock()
+        # Requests made while constructing (e.g., to prime addresses from
+        # address cache) run on the calling thread.
+        self._worker = None
+        super(ThreadedRemoteContext, self).__init__(*args, **kwargs)
+        self._worker = threading.Thread(target=self._run,
+                                         name='RemoteContext I/O')
+        self._worker.daemon = True
+        self._worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        '''
+        Stop I/O worker thread after all queued requests have completed.
+        '''
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+
+    def _run(self):
+        while True:
+            if self._watch_list:
+                # Dispatch watch notifications while idle.
+                try:
+                    item = self._queue.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    try:
+                        self.poll_notifications()
+                    except Exception:
+                        pass
+                    continue
+            else:
+                item = self._queue.get()
+            if item is None:
+                break
+            future, key, function, args = item
+            if key is not None:
+                with self._pending_lock:
+                    if self._pending_reads.get(key) is future:
+                        # Later identical reads must not share a read that
+                        # has already started.
+                        del self._pending_reads[key]
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = function(*args)
+            except Exception as exception:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+
+    def _submit(self, key, function, *args):
+        '''
+        Queue call for I/O worker thread.
+
+        Parameters
+        ----------
+        key : tuple or None
+            For read requests, a hashable key identifying the request (e.g.,
+            ``('read_attribute', attr)``); identical reads that are still
+            queued share a single future.
+
+            ``None`` for requests with side effects (e.g., writes), which are
+            never shared and invalidate all queued reads for sharing.
+        function : function
+            Function to call from I/O worker thread.
+        *args
+            Arguments to pass to :data:`function`.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future resolved with return value of :data:`function`.
+        '''
+        if self._worker is None or threading.current_thread() is \
+                self._worker:
+            # Called during construction, or from a request already running
+            # on the worker; run directly to avoid deadlock.
+            future = Future()
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(function(*args))
+            except Exception as exception:
+                future.set_exception(exception)
+            return future
+        elif not self._worker.is_alive():
+            raise IOError('I/O worker thread is not running.')
+
+        with self._pending_lock:
+            if key is None:
+                self._pending_reads.clear()
+            elif key in self._pending_reads:
+                return self._pending_reads[key]
+            future = Future()
+            if key is not None:
+                self._pending_reads[key] = future
+            self._queue.put((future, key, function, args))
+        return future
+
+    def read_attribute(self, attr):
+        '''
+        Parameters
+        ----------
+        attr : str
+            Name of attribute in remote context.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future resolved with value of specified attribute.
+        '''
+        return self._submit(('read_attribute', attr),
+                            super(ThreadedRemoteContext, self)
+                            ._read_attribute, attr)
+
+    def write_attribute(self, attr, value):
+        '''
+        Parameters
+        ----------
+        attr : str
+            Name of attribute in remote context.
+        value : type of attr
+            Value to set for specified attribute in remote context.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future resolved once value has been written (or, within a
+            :meth:`RemoteContext.batch` block, buffered).
+        '''
+        if self._write_batch is not None:
+            # Buffer in the calling thread's batch.
+            future = Future()
+            future.set_running_or_notify_cancel()
+            try:
+                super(ThreadedRemoteContext, self)._write_attribute(attr,
+                                                                    value)
+            except Exception as exception:
+                future.set_exception(exception)
+            else:
+                future.set_result(None)
+            return future
+        return self._submit(None, super(ThreadedRemoteContext, self)
+                            ._write_attribute, attr, value)
+
+    def read_attributes(self):
+        '''
+        Returns
+        -------
+        concurrent.futures.Future
+            Future resolved with value of each attribute (see
+            :meth:`RemoteContext._read_attributes`).
+        '''
+        return self._submit(('read_attributes', ),
+                            super(ThreadedRemoteContext, self)
+                            ._read_attributes)
+
+    def _read_attribute(self, attr, *args):
+        if args and self._dtypes[attr] is None:
+            return args[0]
+        return self.read_attribute(attr).result()
+
+    def _write_attribute(self, attr, value):
+        self.write_attribute(attr, value).result()
+
+    def _read_attributes(self):
+        return self.read_attributes().result()
+
+    def prime_addresses(self):
+        return self._submit(None, super(ThreadedRemoteContext, self)
+                            .prime_addresses).result()
+
+    def read_memory(self, address, nbytes):
+        return self._submit(('read_memory', address, nbytes),
+                            super(ThreadedRemoteContext, self).read_memory,
+                            address, nbytes).result()
+
+    def _address(self, attr):
+        return self._submit(('address', attr),
+                            super(ThreadedRemoteContext, self)._address,
+                            attr).result()
+
+    def write_memory(self, address, data):
+        if self._write_batch is not None:
+            # Buffer in the calling thread's batch.
+            super(ThreadedRemoteContext, self).write_memory(address, data)
+            return
+        self._submit(None, super(ThreadedRemoteContext, self).write_memory,
+                     address, data).result()
+
+    def _update_watch_list(self):
+        self._submit(None, super(ThreadedRemoteContext, self)
+                     ._update_watch_list).result()
+
+    def poll_notifications(self):
+        return self._submit(None, super(ThreadedRemoteContext, self)
+                            .poll_notifications).result()
+
+    def _flush_writes(self, segments, verify=False):
+        self._submit(None, super(ThreadedRemoteContext, self)._flush_writes,
+                     segments, verify).result()
+
+    def _call(self, function, args):
+        return self._submit(None, super(ThreadedRemoteContext, self)._call,
+                            function, args).result()
+
+    def _call_batch(self, calls):
+        return self._submit(None, super(ThreadedRemoteContext, self)
+                            ._call_batch, calls).result()
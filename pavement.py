@@ -14,7 +14,7 @@ setup(name='cpp-delegate',
       author_email='christian@fobel.net',
       url='https://github.com/wheeler-microfluidics/cpp-delegate',
       license='GPL',
-      packages=['cpp_delegate'],
+      packages=['cpp_delegate', 'cpp_delegate.tests'],
       install_requires=['clang-helpers', 'jinja2', 'nadamq', 'numpy',
                         'path-helpers', 'pydash', 'six'],
       # Install data listed in `MANIFEST.in`